@@ -1,9 +1,15 @@
+import time
+_boot_started = time.perf_counter()
+
+import click
+import logging
 from flask import Flask, render_template
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from models import db, Student, Evaluator
 from routes import main
 from config import Config
+import instrumentation
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -11,6 +17,9 @@ app.config.from_object(Config)
 # Initialize database
 db.init_app(app)
 
+# Initialize request and query timing
+instrumentation.init_app(app, db)
+
 # Initialize CSRF Protection
 csrf = CSRFProtect(app)
 
@@ -42,5 +51,36 @@ def internal_error(error):
 # Register Blueprints
 app.register_blueprint(main)
 
+# Load the grading models in the background so the first evaluation is fast
+# while pages that need no models are served immediately. In preload mode they
+# are loaded here, before gunicorn forks, and no thread may be started.
+if Config.PRELOAD_MODELS:
+    from model_registry import registry
+    registry.preload(Config.PRELOAD_MODEL_NAMES)
+elif Config.MODEL_WARMUP:
+    from model_registry import registry
+    registry.start_warm_up(Config.WARMUP_MODELS)
+
+logging.info(f"App initialised in {time.perf_counter() - _boot_started:.2f}s")
+
+# CLI Commands
+@app.cli.command('grade-paper')
+@click.argument('paper_id', type=int)
+@click.option('--batch-size', default=16, show_default=True, help='Sentence encoder batch size.')
+@click.option('--summary-batch-size', default=8, show_default=True, help='T5 generate batch size.')
+@click.option('--force', is_flag=True, help='Recompute evaluations that are already up to date.')
+def grade_paper_command(paper_id, batch_size, summary_batch_size, force):
+    """Grade every answer submitted for a question paper."""
+    from batch_grading import grade_paper, format_report
+    report = grade_paper(paper_id, batch_size=batch_size, summary_batch_size=summary_batch_size, force=force)
+    click.echo(format_report(report))
+
+@app.cli.command('predict-paper')
+@click.argument('paper_id', type=int)
+def predict_paper_command(paper_id):
+    """Predict marks for a question paper with the Keras grader."""
+    from batch_grading import predict_paper_marks, format_report
+    click.echo(format_report(predict_paper_marks(paper_id)))
+
 if __name__ == '__main__':
     app.run(debug=False)
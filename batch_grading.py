@@ -0,0 +1,188 @@
+"""
+Whole-paper grading for descriptive answers.
+
+Instead of grading one answer per `/view_metrics` request, this loads every
+answer submitted for a question paper in one query, runs each metric stage
+over the whole set in batches and writes the resulting evaluations with a
+single bulk upsert.
+"""
+import logging
+import time
+
+from model_registry import model_slot
+from models import db, StudentAnswer, Questions, QuestionPaperQuestion, Evaluation
+from utils import (summarize_many, calculate_similarity_many, count_grammar_mistakes_many, word_count,
+                   score_answer, save_evaluation_results_bulk, evaluation_fingerprint, is_evaluation_current,
+                   predict_marks_batch)
+
+
+class StageTimer:
+    """Collects wall-clock time and item counts for each grading stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, name, items, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.stages[name] = {
+            'items': items,
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(items / elapsed, 2) if elapsed > 0 else None,
+        }
+        return result
+
+
+def load_paper_answers(paper_id):
+    """
+    Return (StudentAnswer, Questions) pairs for every answer to a paper.
+    When a student submitted the same question more than once, only the
+    latest answer is kept.
+    """
+    rows = db.session.query(StudentAnswer, Questions)\
+        .join(Questions, StudentAnswer.question_id == Questions.id)\
+        .join(QuestionPaperQuestion, QuestionPaperQuestion.question_id == Questions.id)\
+        .filter(QuestionPaperQuestion.question_paper_id == paper_id)\
+        .order_by(StudentAnswer.id)\
+        .all()
+
+    latest = {}
+    for answer, question in rows:
+        latest[(answer.student_id, answer.question_id)] = (answer, question)
+    return list(latest.values())
+
+
+def filter_stale_answers(rows):
+    """
+    Split (answer, question) pairs into those whose stored evaluation is out
+    of date and those that can be skipped. Returns (stale rows, fingerprints).
+    """
+    student_ids = {answer.student_id for answer, _ in rows}
+    question_ids = {question.id for _, question in rows}
+    evaluations = Evaluation.query.filter(
+        Evaluation.student_id.in_(student_ids),
+        Evaluation.question_id.in_(question_ids)
+    ).all()
+    evaluations = {(e.student_id, e.question_id): e for e in evaluations}
+
+    stale, fingerprints = [], []
+    for answer, question in rows:
+        fingerprint = evaluation_fingerprint(answer.answer_text, question.model_answer)
+        if not is_evaluation_current(evaluations.get((answer.student_id, question.id)), fingerprint):
+            stale.append((answer, question))
+            fingerprints.append(fingerprint)
+    return stale, fingerprints
+
+
+def grade_paper(paper_id, batch_size=16, summary_batch_size=8, force=False):
+    """
+    Grade every answer for a question paper and return a report with the
+    number of graded answers and per-stage throughput. Answers whose stored
+    evaluation is up to date are skipped unless `force` is set.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    rows = timer.run('load', 0, load_paper_answers, paper_id)
+    timer.stages['load']['items'] = len(rows)
+    total = len(rows)
+
+    if force:
+        fingerprints = [evaluation_fingerprint(a.answer_text, q.model_answer) for a, q in rows]
+    else:
+        rows, fingerprints = timer.run('fingerprint', total, filter_stale_answers, rows) if rows else ([], [])
+    skipped = total - len(rows)
+
+    if not rows:
+        return {'paper_id': paper_id, 'answers': 0, 'skipped': skipped, 'stages': timer.stages,
+                'total_seconds': round(time.perf_counter() - start, 3)}
+
+    student_answers = [answer.answer_text or "" for answer, _ in rows]
+    model_answers = [question.model_answer for _, question in rows]
+    count = len(rows)
+    # Indices of answers for which any stage fell back to a default value
+    failed = set()
+
+    with model_slot('summarizer'):
+        summaries = timer.run('summary', count, summarize_many, student_answers, batch_size=summary_batch_size,
+                              failed=failed)
+    with model_slot('sentence_model'):
+        similarities = timer.run('similarity', count, calculate_similarity_many,
+                                 model_answers, student_answers, batch_size=batch_size, failed=failed)
+    with model_slot('grammar_tool'):
+        grammar = timer.run('grammar', count, count_grammar_mistakes_many, student_answers, failed=failed)
+    word_counts = timer.run('word_count', count, lambda texts: [word_count(t) for t in texts], student_answers)
+
+    results = []
+    for i, (answer, question) in enumerate(rows):
+        results.append({
+            'student_id': answer.student_id,
+            'question_id': question.id,
+            'summary': summaries[i],
+            'similarity': similarities[i],
+            'grammar_mistakes': grammar[i],
+            'word_count': word_counts[i],
+            'predicted_marks': score_answer(similarities[i], word_counts[i], grammar[i]),
+            **fingerprints[i],
+            # Failed answers are saved as degraded so the next run grades them again
+            'degraded': i in failed,
+        })
+
+    timer.run('save', count, save_evaluation_results_bulk, results)
+
+    total_seconds = time.perf_counter() - start
+    logging.info(f"Graded {count} answers for paper {paper_id} in {total_seconds:.2f}s ({skipped} up to date, "
+                 f"{len(failed)} with failed stages)")
+    return {
+        'paper_id': paper_id,
+        'answers': count,
+        'skipped': skipped,
+        'failed': len(failed),
+        'stages': timer.stages,
+        'total_seconds': round(total_seconds, 3),
+        'answers_per_second': round(count / total_seconds, 2) if total_seconds > 0 else None,
+    }
+
+
+def predict_paper_marks(paper_id, max_seq_length=100):
+    """
+    Predict marks for every answer to a paper with the Keras grader in one
+    forward pass and save them as `keras_marks` in one transaction.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    rows = timer.run('load', 0, load_paper_answers, paper_id)
+    timer.stages['load']['items'] = len(rows)
+    count = len(rows)
+
+    predictions = timer.run('predict', count, predict_marks_batch,
+                            [question.question_text for _, question in rows],
+                            [answer.answer_text for answer, _ in rows],
+                            max_seq_length=max_seq_length)
+    timer.run('save', count, save_evaluation_results_bulk, [
+        {'student_id': answer.student_id, 'question_id': question.id, 'keras_marks': marks}
+        for (answer, question), marks in zip(rows, predictions)
+    ])
+
+    total_seconds = time.perf_counter() - start
+    return {
+        'paper_id': paper_id,
+        'answers': count,
+        'skipped': 0,
+        'stages': timer.stages,
+        'total_seconds': round(total_seconds, 3),
+        'answers_per_second': round(count / total_seconds, 2) if total_seconds > 0 else None,
+    }
+
+
+def format_report(report):
+    """Render a grading report as a plain-text table."""
+    lines = [f"Paper {report['paper_id']}: {report['answers']} answers graded, "
+             f"{report['skipped']} up to date, {report.get('failed', 0)} to retry, in {report['total_seconds']}s"]
+    lines.append(f"{'stage':<12}{'items':>8}{'seconds':>10}{'items/s':>10}")
+    for name, stage in report['stages'].items():
+        rate = stage['items_per_second'] if stage['items_per_second'] is not None else '-'
+        lines.append(f"{name:<12}{stage['items']:>8}{stage['seconds']:>10}{rate:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,44 @@
+"""
+Length-bucketed dynamic batching.
+
+Padding a batch to its longest text wastes compute on every shorter text in
+it. Texts are therefore sorted by token length and packed into batches whose
+padded size (longest length x batch size) stays within a token budget, so
+short answers travel in large batches and long answers in small ones.
+Results are always returned in the caller's original order.
+"""
+
+
+def plan_batches(lengths, token_budget, max_batch_size=None):
+    """
+    Group indices into batches of similar length. Each batch satisfies
+    max(length) * len(batch) <= token_budget (a single over-long text still
+    gets a batch of its own) and, if given, len(batch) <= max_batch_size.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for i in order:
+        # Sorted ascending, so this text sets the padded length of the batch
+        length = max(1, lengths[i])
+        if current and (length * (len(current) + 1) > token_budget
+                        or (max_batch_size and len(current) >= max_batch_size)):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_bucketed(items, fn, lengths, token_budget, max_batch_size=None):
+    """
+    Call `fn` on length-bucketed batches of `items` and return its results in
+    the original order. `fn` takes a list of items and returns one result per
+    item.
+    """
+    results = [None] * len(items)
+    for batch in plan_batches(lengths, token_budget, max_batch_size):
+        for i, result in zip(batch, fn([items[i] for i in batch])):
+            results[i] = result
+    return results
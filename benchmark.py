@@ -0,0 +1,180 @@
+"""
+Grading pipeline benchmark over the bundled evaluation dataset.
+
+Replays the question/model answer/student answer rows from
+`student_evaluation_results (2).csv` through every grading stage and reports,
+per stage, the cold time (first call, including model loading), p50/p95 warm
+latency, answers per second and the process's peak RSS after the stage.
+Results are written as JSON so runs from different versions can be compared
+with --compare. The summary stage bypasses the persistent summary cache, so
+every run measures T5 rather than cache hits; pass --summary-cache to
+measure the cached path instead.
+
+Usage:
+    python benchmark.py --limit 200 --output bench.json
+    python benchmark.py --limit 200 --compare bench.json
+"""
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from config import Config
+from utils import (load_dataset, calculate_summary, calculate_similarity, count_grammar_mistakes, word_count,
+                   score_answer, predict_marks_batch, current_model_versions)
+
+STAGES = ('summary', 'similarity', 'grammar', 'word_count', 'grader', 'grader_batch', 'score')
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_bytes():
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def time_calls(fn, items):
+    """Call fn on each item and return (results, per-call latencies in seconds)."""
+    results, latencies = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def summarize_latencies(latencies, answers):
+    warm = latencies[1:] or latencies
+    return {
+        'answers': answers,
+        'cold_seconds': round(latencies[0], 6),
+        'warm_p50_seconds': round(percentile(warm, 50), 6),
+        'warm_p95_seconds': round(percentile(warm, 95), 6),
+        'warm_mean_seconds': round(statistics.mean(warm), 6),
+        'answers_per_second': round(answers / sum(latencies), 3) if sum(latencies) > 0 else None,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def run_benchmark(rows, stages, summary_cache=False):
+    questions = [row['Questions'] for row in rows]
+    model_answers = [row['Answers'] for row in rows]
+    student_answers = [row['Student_Answer'] for row in rows]
+    count = len(rows)
+    results = {}
+    metrics = {}
+
+    if 'summary' in stages:
+        _, latencies = time_calls(lambda text: calculate_summary(text, use_cache=summary_cache), student_answers)
+        results['summary'] = summarize_latencies(latencies, count)
+    if 'similarity' in stages or 'score' in stages:
+        metrics['similarity'], latencies = time_calls(lambda pair: calculate_similarity(*pair),
+                                                      list(zip(model_answers, student_answers)))
+        if 'similarity' in stages:
+            results['similarity'] = summarize_latencies(latencies, count)
+    if 'grammar' in stages or 'score' in stages:
+        metrics['grammar'], latencies = time_calls(count_grammar_mistakes, student_answers)
+        if 'grammar' in stages:
+            results['grammar'] = summarize_latencies(latencies, count)
+    if 'word_count' in stages or 'score' in stages:
+        metrics['word_count'], latencies = time_calls(word_count, student_answers)
+        if 'word_count' in stages:
+            results['word_count'] = summarize_latencies(latencies, count)
+    if 'grader' in stages:
+        _, latencies = time_calls(lambda pair: predict_marks_batch([pair[0]], [pair[1]]),
+                                  list(zip(questions, student_answers)))
+        results['grader'] = summarize_latencies(latencies, count)
+    if 'grader_batch' in stages:
+        # One forward pass over every row; cold and warm are two consecutive passes
+        _, latencies = time_calls(lambda _: predict_marks_batch(questions, student_answers), range(2))
+        stage = summarize_latencies(latencies, count)
+        stage['answers_per_second'] = round(count / latencies[-1], 3)
+        results['grader_batch'] = stage
+    if 'score' in stages:
+        _, latencies = time_calls(lambda i: score_answer(metrics['similarity'][i], metrics['word_count'][i],
+                                                         metrics['grammar'][i]), range(count))
+        results['score'] = summarize_latencies(latencies, count)
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"{report['rows']} rows, revision {report['revision']}, models {report['model_versions']}")
+    header = f"{'stage':<14}{'cold s':>10}{'p50 s':>11}{'p95 s':>11}{'ans/s':>10}{'peak RSS MiB':>14}"
+    print(header + ("  p50 vs baseline" if baseline else ""))
+    for name, stage in report['stages'].items():
+        line = (f"{name:<14}{stage['cold_seconds']:>10.3f}{stage['warm_p50_seconds']:>11.4f}"
+                f"{stage['warm_p95_seconds']:>11.4f}{stage['answers_per_second'] or 0:>10.2f}"
+                f"{stage['peak_rss_bytes'] / 2**20:>14.1f}")
+        previous = (baseline or {}).get('stages', {}).get(name)
+        if previous and previous['warm_p50_seconds']:
+            change = (stage['warm_p50_seconds'] / previous['warm_p50_seconds'] - 1) * 100
+            line += f"  {change:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the grading pipeline on the evaluation dataset.')
+    parser.add_argument('--dataset', default='student_evaluation_results (2).csv')
+    parser.add_argument('--limit', type=int, default=None, help='Only replay the first N rows')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--compare', help='Print p50 changes against a previous JSON result')
+    parser.add_argument('--summary-cache', action='store_true',
+                        help='Read and fill the persistent summary cache in the summary stage')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    df = load_dataset(args.dataset).dropna(subset=['Questions', 'Answers', 'Student_Answer'])
+    if args.limit:
+        df = df.head(args.limit)
+    rows = df.astype({'Questions': str, 'Answers': str, 'Student_Answer': str}).to_dict('records')
+
+    start = time.perf_counter()
+    stage_results = run_benchmark(rows, stages, summary_cache=args.summary_cache)
+    report = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'model_versions': current_model_versions(),
+        'summarizer_threads': Config.SUMMARIZER_THREADS,
+        'encoder_threads': Config.ENCODER_THREADS,
+        'summary_cache': args.summary_cache,
+        'rows': len(rows),
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'stages': stage_results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
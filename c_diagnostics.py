@@ -0,0 +1,123 @@
+"""
+Structured gcc diagnostics.
+
+gcc is run with `-fdiagnostics-format=json` (Config.GCC_DIAGNOSTICS_FORMAT),
+which prints every diagnostic with its severity, location and warning option
+as a JSON array. Output that is not JSON (linker errors from ld/collect2,
+runtime error logs, older compilers) is parsed from the usual
+`file:line:column: severity: message` text form instead. Either way grading
+works on `Diagnostic` records and a single `summarize` step.
+"""
+import json
+import re
+from typing import NamedTuple, Optional
+
+JSON_FORMAT_FLAG = '-fdiagnostics-format=json'
+
+ERROR_SEVERITIES = ('error', 'fatal error')
+TEXT_DIAGNOSTIC = re.compile(r'^(?P<file>[^:\s][^:]*):(?P<line>\d+):(?:(?P<column>\d+):)? '
+                             r'(?P<severity>fatal error|error|warning|note): (?P<message>.*?)'
+                             r'(?: \[(?P<option>-W[^\]]+)\])?$')
+# Messages gcc uses for malformed code rather than semantic mistakes
+SYNTAX_MESSAGE = re.compile(r"^(expected |stray |missing terminating |unterminated |syntax error)")
+
+
+class Diagnostic(NamedTuple):
+    severity: str
+    message: str
+    file: Optional[str] = None
+    line: Optional[int] = None
+    column: Optional[int] = None
+    option: Optional[str] = None
+
+    @property
+    def is_error(self):
+        return self.severity in ERROR_SEVERITIES
+
+    @property
+    def is_syntax_error(self):
+        return self.is_error and bool(SYNTAX_MESSAGE.match(self.message))
+
+    def format(self):
+        location = ':'.join(str(part) for part in (self.file, self.line, self.column) if part is not None)
+        text = f"{location}: {self.severity}: {self.message}" if location else f"{self.severity}: {self.message}"
+        return f"{text} [{self.option}]" if self.option else text
+
+
+def _from_json(entry):
+    caret = (entry.get('locations') or [{}])[0].get('caret', {})
+    return Diagnostic(severity=entry.get('kind', 'error'), message=entry.get('message', ''),
+                      file=caret.get('file'), line=caret.get('line'), column=caret.get('column'),
+                      option=entry.get('option'))
+
+
+def parse_json(entries):
+    """Flatten gcc's JSON diagnostics (including child notes) into records."""
+    diagnostics = []
+    for entry in entries:
+        diagnostics.append(_from_json(entry))
+        diagnostics.extend(_from_json(child) for child in entry.get('children', []))
+    return diagnostics
+
+
+def parse_text_line(line):
+    match = TEXT_DIAGNOSTIC.match(line)
+    if match:
+        return Diagnostic(severity=match.group('severity'), message=match.group('message'),
+                          file=match.group('file'), line=int(match.group('line')),
+                          column=int(match.group('column')) if match.group('column') else None,
+                          option=match.group('option'))
+    # Unlocated messages such as "collect2: error: ld returned 1 exit status"
+    for severity in ('fatal error', 'error', 'warning'):
+        marker = f"{severity}:"
+        if marker in line.lower():
+            start = line.lower().index(marker) + len(marker)
+            return Diagnostic(severity=severity, message=line[start:].strip())
+    return None
+
+
+def parse_output(output):
+    """Parse compiler or runtime output, mixing JSON arrays and text lines, into records."""
+    diagnostics = []
+    for line in (output or '').splitlines():
+        stripped = line.strip()
+        if stripped.startswith('[') and stripped.endswith(']'):
+            try:
+                diagnostics.extend(parse_json(json.loads(stripped)))
+                continue
+            except ValueError:
+                pass
+        diagnostic = parse_text_line(stripped)
+        if diagnostic is not None:
+            diagnostics.append(diagnostic)
+    return diagnostics
+
+
+def summarize(diagnostics, is_runtime=False):
+    """
+    Count diagnostics into the error details `calculate_marks` scores.
+
+    Compiler errors are critical (the program does not build); syntax errors
+    are the subset of them caused by malformed code. Warnings are counted
+    separately. Errors from a run of an already compiled program are counted
+    as warnings, so they cost marks without zeroing the submission.
+    """
+    details = {
+        'total_errors': 0,
+        'critical_errors': 0,
+        'syntax_errors': 0,
+        'warnings': 0,
+        'error_messages': [],
+    }
+    for diagnostic in diagnostics:
+        if diagnostic.severity == 'note':
+            continue
+        details['total_errors'] += 1
+        details['error_messages'].append(diagnostic.format())
+        if not diagnostic.is_error or is_runtime:
+            details['warnings'] += 1
+            continue
+        details['critical_errors'] += 1
+        if diagnostic.is_syntax_error:
+            details['syntax_errors'] += 1
+    return details
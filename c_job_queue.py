@@ -0,0 +1,83 @@
+"""
+Background compile-and-run jobs for /upload.
+
+Uploads are recorded in the `c_run_jobs` table and executed on a local thread
+pool, so the request returns a job ID straight away instead of holding a web
+worker while the program compiles and runs. Each run is bounded by the
+sandbox limits in `c_runner`; a job that has not finished within
+Config.C_JOB_TIMEOUT is reported as failed. When Config.C_JOB_QUEUE_LIMIT
+jobs are already waiting or running, new uploads are rejected with
+`QueueFull`.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+from config import Config
+from job_runner import JobRunner, ACTIVE_STATUSES, job_to_dict as _job_to_dict
+from models import db, CRunJob, Questions
+from utils import grade_c_submission
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _grade(job):
+    question = db.session.get(Questions, job.question_id) if job.question_id else None
+    result = grade_c_submission(job.source, job.stdin_data, question)
+    job.result = json.dumps(result)
+    for key, value in (result['profile'] or {}).items():
+        if hasattr(CRunJob, key):
+            setattr(job, key, value)
+
+
+_runner = JobRunner(CRunJob, _grade, Config.C_JOB_WORKERS, 'c-job')
+
+
+def _stale_cutoff():
+    return datetime.utcnow() - timedelta(seconds=Config.C_JOB_TIMEOUT)
+
+
+def queue_depth():
+    """Jobs waiting or running that have not gone stale."""
+    return CRunJob.query.filter(CRunJob.status.in_(ACTIVE_STATUSES), CRunJob.created_at >= _stale_cutoff()).count()
+
+
+def submit_c_run_job(source, stdin_data=None, question_id=None):
+    """Queue a compile-and-run job and return it; raises QueueFull when overloaded."""
+    if queue_depth() >= Config.C_JOB_QUEUE_LIMIT:
+        raise QueueFull(f"{Config.C_JOB_QUEUE_LIMIT} programs are already waiting to run")
+
+    job = _runner.submit(CRunJob(source=source, stdin_data=stdin_data, question_id=question_id))
+    logging.info(f"Queued C run job {job.id}")
+    return job
+
+
+def expire_if_stale(job):
+    """Mark a job that outlived Config.C_JOB_TIMEOUT as failed."""
+    if job.status in ACTIVE_STATUSES and job.created_at < _stale_cutoff():
+        job.status = 'failed'
+        job.error = f"Timed out after {Config.C_JOB_TIMEOUT}s"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
+
+
+def job_result(job):
+    """
+    The stored grading result, safe to show the submitter: the input,
+    expected output and program output of hidden test cases are removed.
+    """
+    if not job.result:
+        return None
+    result = json.loads(job.result)
+    for case in result['test_results']:
+        if case['test_case']['is_hidden']:
+            case['test_case']['input_text'] = case['test_case']['expected_output'] = None
+            case['stdout'] = None
+    return result
+
+
+def job_to_dict(job):
+    return _job_to_dict(job, 'question_id')
@@ -0,0 +1,420 @@
+"""
+Sandboxed compile-and-run service for student C programs.
+
+Every job gets its own temporary directory under Config.COMPILE_OUTPUT_DIR,
+is compiled with Config.GCC_PATH and runs with rlimits on CPU time, address
+space, file size (which also caps stdout/stderr, since both go to files in
+the job directory) and core dumps, plus a wall-clock timeout that kills the
+whole process group. The limits are applied by sandbox_launcher.c, which
+is built on first use; without it no student program is run. The runner
+itself does not queue jobs: callers run it from the c_job_queue workers, so
+Config.C_JOB_WORKERS bounds how many programs compile and run at a time.
+Batch syntax checks use a pool of the same size.
+"""
+import hashlib
+import json
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from c_diagnostics import JSON_FORMAT_FLAG, parse_output
+from compile_cache import CompileCache, compiler_identity
+from config import Config
+from instrumentation import timed
+
+SOURCE_NAME = 'main.c'
+BINARY_NAME = 'main'
+LAUNCHER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_launcher.c')
+# Stdout kept per test case for display; matching streams the whole capped file
+PREVIEW_BYTES = 4096
+
+
+# Compiled with JSON_FORMAT_FLAG to check that gcc emits JSON diagnostics
+JSON_PROBE_SOURCE = b'int main(void) { int unused; return 0; }\n'
+
+
+def supports_json_diagnostics(gcc_path, timeout=10):
+    """
+    True if `gcc_path` accepts JSON_FORMAT_FLAG and prints its diagnostics as
+    JSON. gcc before 9 rejects the flag, and newer releases drop it in favour
+    of SARIF.
+    """
+    try:
+        result = subprocess.run([gcc_path, JSON_FORMAT_FLAG, '-Wall', '-fsyntax-only', '-x', 'c', '-'],
+                                input=JSON_PROBE_SOURCE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=timeout)
+        return result.returncode == 0 and isinstance(json.loads(result.stderr), list)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return False
+
+
+class SandboxUnavailable(RuntimeError):
+    """The sandbox launcher could not be built, so programs cannot be run safely."""
+
+
+def wait_with_rusage(process, timeout):
+    """
+    Reap `process` with os.wait4 so its resource usage is captured, killing
+    its process group if it outlives `timeout` seconds. Returns (returncode,
+    rusage, timed_out).
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    timed_out = False
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() >= deadline:
+            timed_out = True
+            os.killpg(process.pid, signal.SIGKILL)
+            _, status, rusage = os.wait4(process.pid, 0)
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    # Keep Popen from trying to reap the process again
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage, timed_out
+
+
+def merge_profiles(profiles):
+    """Worst case of each measurement over several runs, e.g. the cases of a test suite."""
+    profiles = [profile for profile in profiles if profile]
+    if not profiles:
+        return None
+    return {key: max((profile[key] for profile in profiles if profile[key] is not None), default=None)
+            for key in profiles[0]}
+
+
+def output_matches(stdout_path, expected_output):
+    """
+    Compare a program's stdout file with the expected output line by line,
+    without reading the file into memory. Trailing whitespace on each line and
+    trailing blank lines are ignored.
+    """
+    expected = [line.rstrip() for line in expected_output.replace('\r\n', '\n').split('\n')]
+    while expected and not expected[-1]:
+        expected.pop()
+
+    matched = 0
+    with open(stdout_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip()
+            if matched < len(expected):
+                if line != expected[matched]:
+                    return False
+                matched += 1
+            elif line:
+                return False
+    return matched == len(expected)
+
+
+class CRunner:
+    def __init__(self, gcc_path='gcc', flags=(), work_dir=None, workers=4, cpu_seconds=5, memory_bytes=256 * 2**20,
+                 wall_seconds=10, output_bytes=2**20, compile_timeout=30, cache=None, test_parallelism=8):
+        self.gcc_path = gcc_path
+        self.flags = list(flags)
+        self.work_dir = work_dir
+        self.workers = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_seconds = wall_seconds
+        self.output_bytes = output_bytes
+        self.compile_timeout = compile_timeout
+        self.cache = cache
+        self.test_parallelism = test_parallelism
+        self._compiler = None
+        self._launcher = None
+        self._launcher_lock = threading.Lock()
+        self._executor = None
+        self._case_executor = None
+        self._executor_lock = threading.Lock()
+        if work_dir:
+            os.makedirs(work_dir, exist_ok=True)
+
+    @property
+    def launcher(self):
+        """
+        Path of the compiled sandbox_launcher.c. Raises SandboxUnavailable if
+        it cannot be built; the build is retried on the next run.
+        """
+        if self._launcher is None:
+            with self._launcher_lock:
+                if self._launcher is None:
+                    self._launcher = self._build_launcher()
+        return self._launcher
+
+    def _build_launcher(self):
+        try:
+            with open(LAUNCHER_SOURCE, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            path = os.path.join(self.work_dir or tempfile.gettempdir(), f'sandbox-launcher-{digest}')
+            if not os.path.exists(path):
+                staging = f'{path}.{os.getpid()}.tmp'
+                subprocess.run([self.gcc_path, '-O2', '-o', staging, LAUNCHER_SOURCE], check=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=self.compile_timeout)
+                os.replace(staging, path)
+            return path
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.error(f"Could not build the sandbox launcher: {e}")
+            raise SandboxUnavailable(f"The sandbox launcher could not be built: {e}") from e
+
+    def _wait_for_launcher(self, process, report_path):
+        """
+        Wait for the launcher and read the usage it reported for the program.
+        The launcher enforces the wall-clock limit itself; the extra margin
+        here only catches a launcher that stopped responding.
+        """
+        returncode, rusage, timed_out = wait_with_rusage(process, self.wall_seconds + 5)
+        try:
+            with open(report_path) as f:
+                exit_code, signal_number, launcher_timed_out, user, system, max_rss = f.read().split()
+        except (OSError, ValueError):
+            return returncode, (rusage.ru_utime, rusage.ru_stime, None), timed_out
+        returncode = -int(signal_number) if int(signal_number) else int(exit_code)
+        return returncode, (float(user), float(system), int(max_rss)), bool(int(launcher_timed_out))
+
+    @property
+    def compiler(self):
+        if self._compiler is None:
+            self._compiler = compiler_identity(self.gcc_path)
+        return self._compiler
+
+    def compile(self, job_dir, source=None):
+        """
+        Compile main.c in `job_dir`; returns (returncode, compiler output).
+        When a cache is configured and `source` is given, identical earlier
+        compilations are reused without running gcc.
+        """
+        key = None
+        if self.cache is not None and source is not None:
+            key = self.cache.key(source, self.compiler, self.flags)
+            cached = self.cache.get(key, job_dir, BINARY_NAME)
+            if cached is not None:
+                return cached
+
+        # Relative paths keep the job directory out of the diagnostics
+        command = [self.gcc_path, *self.flags, '-o', BINARY_NAME, SOURCE_NAME, '-lm']
+        with timed('gcc_compile'):
+            try:
+                process = subprocess.run(command, cwd=job_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         timeout=self.compile_timeout)
+            except subprocess.TimeoutExpired:
+                return -1, f"error: compilation exceeded the {self.compile_timeout}s time limit"
+        output = process.stdout.decode('utf-8', errors='replace')
+        if key is not None:
+            self.cache.put(key, process.returncode, output, os.path.join(job_dir, BINARY_NAME))
+        return process.returncode, output
+
+    def check_syntax(self, source):
+        """
+        Syntax-check one source by piping it to `gcc -x c -fsyntax-only -`;
+        nothing is written to disk. Returns a dict with `ok`, the raw
+        compiler `output` and the parsed `diagnostics` (see
+        `c_diagnostics.Diagnostic`).
+        """
+        command = [self.gcc_path, *self.flags, '-x', 'c', '-fsyntax-only', '-']
+        with timed('gcc_syntax_check'):
+            try:
+                process = subprocess.run(command, input=source.encode('utf-8'), stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, timeout=self.compile_timeout)
+            except subprocess.TimeoutExpired:
+                message = f"syntax check exceeded the {self.compile_timeout}s time limit"
+                return {'ok': False, 'output': f"error: {message}",
+                        'diagnostics': [diagnostic._asdict() for diagnostic in parse_output(f"error: {message}")]}
+
+        output = process.stdout.decode('utf-8', errors='replace')
+        return {'ok': process.returncode == 0, 'output': output,
+                'diagnostics': [diagnostic._asdict() for diagnostic in parse_output(output)]}
+
+    def check_syntax_many(self, sources):
+        """Syntax-check a list of sources concurrently on the pool; results keep the input order."""
+        futures = [self._get_executor().submit(self.check_syntax, source) for source in sources]
+        return [future.result() for future in futures]
+
+    def execute(self, job_dir, stdin_data=None, run_dir=None, expected_output=None):
+        """
+        Run the compiled binary in `job_dir` under the configured limits, with
+        `run_dir` (default: `job_dir`) as its working directory. Returns a dict
+        with returncode, stdout, stderr, timed_out, output_truncated, seconds
+        and the run's resource usage `profile` (CPU, max RSS, wall time and
+        output size). When `expected_output` is given, stdout is matched against it
+        into `passed` and only a preview of it is returned.
+        """
+        run_dir = run_dir or job_dir
+        stdin_path = os.path.join(run_dir, 'stdin.txt')
+        stdout_path = os.path.join(run_dir, 'stdout.txt')
+        stderr_path = os.path.join(run_dir, 'stderr.txt')
+        with open(stdin_path, 'wb') as f:
+            f.write(stdin_data or b'')
+
+        binary = os.path.join(job_dir, BINARY_NAME)
+        launcher = self.launcher
+        start = time.perf_counter()
+        with timed('c_program_run'), open(stdin_path, 'rb') as stdin, open(stdout_path, 'wb') as stdout, \
+                open(stderr_path, 'wb') as stderr:
+            # The launcher applies the rlimits: preexec_fn is not safe in this multi-threaded server
+            report_path = os.path.join(run_dir, 'rusage.txt')
+            command = [launcher, report_path, str(self.cpu_seconds), str(self.memory_bytes),
+                       str(self.output_bytes), str(self.wall_seconds), binary]
+            process = subprocess.Popen(command, cwd=run_dir, stdin=stdin, stdout=stdout, stderr=stderr,
+                                       start_new_session=True, env={'PATH': '/usr/bin:/bin'})
+            returncode, (user, system, max_rss), timed_out = self._wait_for_launcher(process, report_path)
+            try:
+                # Anything the program left running in its session
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        seconds = time.perf_counter() - start
+        output_size = os.path.getsize(stdout_path)
+
+        read_bytes = PREVIEW_BYTES if expected_output is not None else self.output_bytes
+        with open(stdout_path, 'rb') as f:
+            output = f.read(read_bytes)
+        with open(stderr_path, 'rb') as f:
+            errors = f.read(read_bytes)
+        result = {
+            'returncode': returncode,
+            'stdout': output.decode('utf-8', errors='replace'),
+            'stderr': errors.decode('utf-8', errors='replace'),
+            'timed_out': timed_out,
+            'output_truncated': returncode == -signal.SIGXFSZ or output_size >= self.output_bytes,
+            'seconds': round(seconds, 4),
+            'profile': {
+                'user_seconds': round(user, 4),
+                'system_seconds': round(system, 4),
+                'cpu_seconds': round(user + system, 4),
+                'max_rss_kb': max_rss,  # KiB on Linux
+                'wall_seconds': round(seconds, 4),
+                'output_bytes': output_size,
+            },
+        }
+        if expected_output is not None:
+            result['passed'] = (returncode == 0 and not timed_out and not result['output_truncated']
+                                and output_matches(stdout_path, expected_output))
+        return result
+
+    def run(self, source, stdin_data=None):
+        """
+        Compile and run one program in a fresh directory. Returns a dict with
+        `status` ('Success', 'Compilation Error' or 'Runtime Error'),
+        `compile_output` and, once compiled, the `execute` fields.
+        """
+        with tempfile.TemporaryDirectory(prefix='cjob-', dir=self.work_dir) as job_dir:
+            with open(os.path.join(job_dir, SOURCE_NAME), 'w', encoding='utf-8') as f:
+                f.write(source)
+
+            returncode, compile_output = self.compile(job_dir, source)
+            if returncode != 0:
+                return {'status': 'Compilation Error', 'compile_output': compile_output, 'profile': None}
+
+            result = self.execute(job_dir, stdin_data)
+            result['compile_output'] = compile_output
+            result['status'] = 'Success' if result['returncode'] == 0 and not result['timed_out'] else 'Runtime Error'
+            return result
+
+    def run_tests(self, source, cases):
+        """
+        Compile `source` once and run it against every (stdin_data,
+        expected_output) pair in `cases`. Cases run concurrently, each in its
+        own directory and under its own wall-clock limit, so a suite takes
+        about as long as its slowest case. Returns a dict with `status`,
+        `compile_output` and one `execute` result per case.
+        """
+        with tempfile.TemporaryDirectory(prefix='cjob-', dir=self.work_dir) as job_dir:
+            with open(os.path.join(job_dir, SOURCE_NAME), 'w', encoding='utf-8') as f:
+                f.write(source)
+
+            returncode, compile_output = self.compile(job_dir, source)
+            if returncode != 0:
+                return {'status': 'Compilation Error', 'compile_output': compile_output, 'cases': [], 'profile': None}
+
+            def run_case(index, stdin_data, expected_output):
+                run_dir = os.path.join(job_dir, f'case-{index}')
+                os.mkdir(run_dir)
+                return self.execute(job_dir, stdin_data, run_dir=run_dir, expected_output=expected_output)
+
+            executor = self._get_case_executor()
+            futures = [executor.submit(run_case, i, stdin_data, expected_output)
+                       for i, (stdin_data, expected_output) in enumerate(cases)]
+            results = [future.result() for future in futures]
+
+        failed_to_run = any(r['timed_out'] or r['returncode'] != 0 for r in results)
+        return {'status': 'Runtime Error' if failed_to_run else 'Success', 'compile_output': compile_output,
+                'cases': results, 'profile': merge_profiles(r['profile'] for r in results)}
+
+    def _get_case_executor(self):
+        # Separate from the syntax-check pool so the two never wait on each other
+        if self._case_executor is None:
+            with self._executor_lock:
+                if self._case_executor is None:
+                    self._case_executor = ThreadPoolExecutor(max_workers=self.test_parallelism,
+                                                             thread_name_prefix='c-test-case')
+        return self._case_executor
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='c-syntax')
+        return self._executor
+
+
+def runtime_error_log(result):
+    """Describe a failed run as compiler-style error lines for `classify_errors`."""
+    lines = [result['stderr'].strip()] if result['stderr'].strip() else []
+    if result['timed_out']:
+        lines.append("error: program exceeded the wall-clock time limit")
+    elif result['returncode'] < 0:
+        try:
+            name = signal.Signals(-result['returncode']).name
+        except ValueError:
+            name = str(-result['returncode'])
+        lines.append(f"error: program terminated by signal {name}")
+    elif result['returncode'] != 0:
+        lines.append(f"error: program exited with status {result['returncode']}")
+    if result['output_truncated']:
+        lines.append("error: program output exceeded the size limit")
+    return '\n'.join(lines)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_c_runner():
+    """Return the process-wide runner built from Config."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                flags = shlex.split(Config.GCC_FLAGS)
+                if Config.GCC_DIAGNOSTICS_FORMAT == 'json':
+                    if supports_json_diagnostics(Config.GCC_PATH):
+                        flags.append(JSON_FORMAT_FLAG)
+                    else:
+                        # Otherwise every submission would fail to compile on the unknown flag
+                        logging.warning(f"{Config.GCC_PATH} does not support {JSON_FORMAT_FLAG}; "
+                                        f"parsing text diagnostics instead")
+                _runner = CRunner(
+                    gcc_path=Config.GCC_PATH,
+                    flags=flags,
+                    work_dir=Config.COMPILE_OUTPUT_DIR,
+                    workers=Config.C_JOB_WORKERS,
+                    cpu_seconds=Config.C_CPU_SECONDS,
+                    memory_bytes=Config.C_MEMORY_MB * 2**20,
+                    wall_seconds=Config.C_WALL_SECONDS,
+                    output_bytes=Config.C_OUTPUT_BYTES,
+                    compile_timeout=Config.C_COMPILE_TIMEOUT,
+                    cache=CompileCache(Config.COMPILE_CACHE_DIR, Config.COMPILE_CACHE_MAX_MB * 2**20)
+                    if Config.COMPILE_CACHE_MAX_MB else None,
+                    test_parallelism=Config.C_TEST_PARALLELISM,
+                )
+                logging.info(f"C runner ready: {Config.GCC_PATH}, {Config.C_JOB_WORKERS} workers")
+    return _runner
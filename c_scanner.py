@@ -0,0 +1,131 @@
+"""
+Single-pass security scanner for C submissions.
+
+The source is tokenized once with one regular expression. Comments, string
+and character literals are skipped, so `exit` in a comment or the identifier
+`exited` no longer trip the checks. Identifiers are then looked up in
+allow/deny sets and `#include` targets are matched against include sets.
+Directives are recognised the way the preprocessor sees them: after
+backslash-newline splices are joined, a `#` (or `%:`, `??=`) preceded on its line
+only by whitespace and comments starts a directive, so
+`/* x */ #include <windows.h>` is checked too. An include whose target is a
+macro cannot be checked and is always reported.
+Findings carry the line they were found on. The sets come from Config
+(C_DENY_IDENTIFIERS, C_ALLOW_IDENTIFIERS, C_DENY_INCLUDES,
+C_ALLOW_INCLUDES); an identifier or include in an allow set is never
+reported, and a non-empty C_ALLOW_INCLUDES rejects every header not in it.
+"""
+import posixpath
+import re
+from bisect import bisect_right
+from typing import NamedTuple
+
+from config import Config
+
+TOKEN = re.compile(r'''
+      (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<string>"(?:\\.|[^"\\\n])*"?)
+    | (?P<char>'(?:\\.|[^'\\\n])*'?)
+    | (?P<number>\.?\d[\w.]*)
+    | (?P<identifier>[A-Za-z_]\w*)
+    | (?P<hash>\#|%:|\?\?=)
+    | (?P<newline>\n)
+''', re.VERBOSE | re.DOTALL)
+# The target of an include directive; comments may sit between it and the directive name
+HEADER = re.compile(r'[ \t]*(?:/\*.*?\*/[ \t]*)*(?:<(?P<angled>[^>\n]*)>|"(?P<quoted>[^"\n]*)")', re.DOTALL)
+# Backslash-newline (or its trigraph), which the preprocessor removes before anything else
+SPLICE = re.compile(r'(?:\\|\?\?/)[ \t]*\r?\n')
+INCLUDE_DIRECTIVES = frozenset({'include', 'include_next', 'import'})
+
+
+class Finding(NamedTuple):
+    line: int
+    kind: str  # 'function', 'include' or 'limit'
+    name: str
+    message: str
+
+
+class CScanner:
+    def __init__(self, deny_identifiers=(), allow_identifiers=(), deny_includes=(), allow_includes=(),
+                 max_fopen=3):
+        self.deny_identifiers = frozenset(deny_identifiers) - frozenset(allow_identifiers)
+        self.deny_includes = frozenset(deny_includes) - frozenset(allow_includes)
+        self.allow_includes = frozenset(allow_includes)
+        self.max_fopen = max_fopen
+
+    def scan(self, source):
+        """Return the findings for one source, in source order."""
+        # Join spliced lines, remembering where each splice was so line numbers stay right
+        splices = []
+        removed = 0
+        for splice in SPLICE.finditer(source):
+            splices.append(splice.start() - removed)
+            removed += len(splice.group())
+        text = SPLICE.sub('', source)
+
+        findings = []
+        line = 1
+        fopen_count = 0
+        at_line_start = True  # only whitespace and comments so far on this line
+        in_directive = False  # the previous token was a directive's '#'
+        pos = 0
+        while True:
+            match = TOKEN.search(text, pos)
+            if match is None:
+                break
+            kind = match.lastgroup
+            pos = match.end()
+            if kind == 'newline':
+                line += 1
+                at_line_start, in_directive = True, False
+                continue
+            if kind == 'comment':
+                # A comment counts as whitespace, even one spanning lines
+                line += match.group().count('\n')
+                continue
+
+            token_line = line + bisect_right(splices, match.start())
+            if kind == 'hash' and at_line_start:
+                at_line_start, in_directive = False, True
+                continue
+            if kind == 'identifier' and in_directive and match.group() in INCLUDE_DIRECTIVES:
+                header = HEADER.match(text, pos)
+                if header is None:
+                    findings.append(Finding(token_line, 'include', match.group(),
+                                            f"Include of a macro cannot be checked (line {token_line})"))
+                else:
+                    # gcc resolves <./windows.h> and <sys//socket.h> to the same files
+                    name = posixpath.normpath((header.group('angled') or header.group('quoted') or '').strip())
+                    if name in self.deny_includes or (self.allow_includes and name not in self.allow_includes):
+                        findings.append(Finding(token_line, 'include', name,
+                                                f"Potentially dangerous include '{name}' detected on line {token_line}"))
+                    line += header.group().count('\n')
+                    pos = header.end()
+            elif kind == 'identifier':
+                name = match.group()
+                if name in self.deny_identifiers:
+                    findings.append(Finding(token_line, 'function', name,
+                                            f"Dangerous function '{name}' detected on line {token_line}"))
+                elif name == 'fopen':
+                    fopen_count += 1
+                    if fopen_count == self.max_fopen + 1:
+                        findings.append(Finding(token_line, 'limit', name,
+                                                f"Too many file operations detected (line {token_line})"))
+            at_line_start = in_directive = False
+        return findings
+
+    def scan_many(self, sources):
+        """Scan a batch of sources; returns one findings list per source."""
+        return [self.scan(source) for source in sources]
+
+
+_scanner = None
+
+
+def get_c_scanner():
+    """Return the scanner built from Config."""
+    global _scanner
+    if _scanner is None:
+        _scanner = CScanner(Config.C_DENY_IDENTIFIERS, Config.C_ALLOW_IDENTIFIERS, Config.C_DENY_INCLUDES,
+                            Config.C_ALLOW_INCLUDES, Config.C_MAX_FOPEN)
+    return _scanner
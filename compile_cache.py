@@ -0,0 +1,145 @@
+"""
+On-disk cache of gcc results for C submissions.
+
+Lab submissions are often byte-identical or differ only in whitespace, so
+compilations are keyed by a SHA-256 of the normalized source together with
+the compiler identity and flags. Each entry keeps gcc's return code and
+diagnostics and, when compilation succeeded, the binary. Entries are
+directories written atomically and touched on every hit; once the cache grows
+past its size limit the least recently used ones are evicted.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from instrumentation import counter
+
+CACHE_LOOKUPS = counter('compile_cache_lookups_total', 'Compile cache lookups by result')
+
+BINARY_FILE = 'binary'
+META_FILE = 'meta.json'
+
+
+def normalize_source(source):
+    """Line endings and trailing whitespace do not change what gcc produces."""
+    lines = [line.rstrip() for line in source.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    return '\n'.join(lines).rstrip('\n') + '\n'
+
+
+def compiler_identity(gcc_path):
+    """Resolved compiler path plus its `--version` banner."""
+    try:
+        banner = subprocess.run([gcc_path, '--version'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, timeout=10).stdout.splitlines()[0]
+    except (OSError, subprocess.SubprocessError, IndexError):
+        banner = 'unknown'
+    return f"{shutil.which(gcc_path) or gcc_path}|{banner}"
+
+
+class CompileCache:
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def key(self, source, compiler, flags):
+        payload = json.dumps([normalize_source(source), compiler, list(flags)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        """Yield (path, last used, size in bytes) for every entry."""
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                path = os.path.join(shard_path, name)
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                    yield path, os.path.getmtime(path), size
+                except OSError:
+                    continue
+
+    def get(self, key, job_dir, binary_name):
+        """
+        Return (returncode, diagnostics) for a cached compilation and copy its
+        binary into `job_dir`, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            if meta['returncode'] == 0:
+                shutil.copy2(os.path.join(path, BINARY_FILE), os.path.join(job_dir, binary_name))
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result='miss')
+            return None
+        self.hits += 1
+        CACHE_LOOKUPS.inc(result='hit')
+        return meta['returncode'], meta['output']
+
+    def put(self, key, returncode, output, binary_path=None):
+        """Store a compilation result; `binary_path` is required when it succeeded."""
+        path = self._path(key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Build the entry next to its final location and rename it into place
+        # so concurrent readers never see a half-written entry
+        staging = tempfile.mkdtemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            if returncode == 0:
+                shutil.copy2(binary_path, os.path.join(staging, BINARY_FILE))
+            with open(os.path.join(staging, META_FILE), 'w') as f:
+                json.dump({'returncode': returncode, 'output': output}, f)
+            size = sum(os.path.getsize(os.path.join(staging, f)) for f in os.listdir(staging))
+            os.rename(staging, path)
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(path):
+                logging.warning(f"Could not cache compilation {key}: {e}")
+            return
+
+        with self._lock:
+            self._size += size
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache is within 90% of its limit."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * 0.9
+            removed = 0
+            for path, _, size in entries:
+                if total <= target:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+            self._size = total
+        if removed:
+            logging.info(f"Evicted {removed} compile cache entries")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'size_bytes': self._size, 'max_bytes': self.max_bytes}
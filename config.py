@@ -1,5 +1,6 @@
 # config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -30,4 +31,93 @@ class Config:
     
     # Compilation Configuration
     GCC_PATH = os.getenv('GCC_PATH', 'gcc')
-    COMPILE_OUTPUT_DIR = os.getenv('COMPILE_OUTPUT_DIR', 'C:/workspaces/error_log/test')
+    GCC_FLAGS = os.getenv('GCC_FLAGS', '')
+    GCC_DIAGNOSTICS_FORMAT = os.getenv('GCC_DIAGNOSTICS_FORMAT', 'json')  # json (falls back to text if gcc lacks it) or text
+    # Parent directory of the per-job sandbox directories
+    COMPILE_OUTPUT_DIR = os.getenv('COMPILE_OUTPUT_DIR', os.path.join(tempfile.gettempdir(), 'assessment-c-jobs'))
+    C_COMPILE_TIMEOUT = int(os.getenv('C_COMPILE_TIMEOUT', '30'))
+    C_CPU_SECONDS = int(os.getenv('C_CPU_SECONDS', '5'))
+    C_WALL_SECONDS = int(os.getenv('C_WALL_SECONDS', '10'))
+    C_MEMORY_MB = int(os.getenv('C_MEMORY_MB', '256'))
+    C_OUTPUT_BYTES = int(os.getenv('C_OUTPUT_BYTES', str(1024 * 1024)))
+    # Test cases of one submission that run at the same time
+    C_TEST_PARALLELISM = int(os.getenv('C_TEST_PARALLELISM', str(2 * (os.cpu_count() or 2))))
+    COMPILE_CACHE_DIR = os.getenv('COMPILE_CACHE_DIR', 'compile_cache')
+    COMPILE_CACHE_MAX_MB = int(os.getenv('COMPILE_CACHE_MAX_MB', '256'))  # 0 disables the cache
+    # Efficiency-aware C grading against each question's reference solution
+    C_PERFORMANCE_MARKS = os.getenv('C_PERFORMANCE_MARKS', 'false').lower() == 'true'
+    C_PERFORMANCE_SLOW_RATIO = float(os.getenv('C_PERFORMANCE_SLOW_RATIO', '3.0'))  # times the reference usage
+    C_PERFORMANCE_PENALTY = float(os.getenv('C_PERFORMANCE_PENALTY', '2.0'))
+    C_PERFORMANCE_BONUS = float(os.getenv('C_PERFORMANCE_BONUS', '1.0'))  # never raises marks above the maximum
+    C_PERFORMANCE_MIN_CPU_SECONDS = float(os.getenv('C_PERFORMANCE_MIN_CPU_SECONDS', '0.05'))
+    C_PERFORMANCE_MIN_RSS_KB = int(os.getenv('C_PERFORMANCE_MIN_RSS_KB', '2048'))
+    # Background /upload jobs: concurrent jobs (also the batch syntax-check pool size), queued jobs before uploads are rejected, seconds before a job is abandoned
+    C_JOB_WORKERS = int(os.getenv('C_JOB_WORKERS', str(os.cpu_count() or 2)))
+    C_JOB_QUEUE_LIMIT = int(os.getenv('C_JOB_QUEUE_LIMIT', '100'))
+    C_JOB_TIMEOUT = int(os.getenv('C_JOB_TIMEOUT', '300'))
+
+    # C Source Scanner Configuration (comma-separated identifier and header names)
+    C_DENY_IDENTIFIERS = [name.strip() for name in os.getenv(
+        'C_DENY_IDENTIFIERS',
+        'system,popen,fork,vfork,exit,_exit,remove,unlink,rmdir,chmod,'
+        'execl,execlp,execle,execv,execvp,execvpe,execve,fexecve').split(',') if name.strip()]
+    C_ALLOW_IDENTIFIERS = [name.strip() for name in os.getenv('C_ALLOW_IDENTIFIERS', '').split(',') if name.strip()]
+    C_DENY_INCLUDES = [name.strip() for name in os.getenv(
+        'C_DENY_INCLUDES', 'windows.h,sys/socket.h,netinet/in.h').split(',') if name.strip()]
+    # When set, only these headers may be included
+    C_ALLOW_INCLUDES = [name.strip() for name in os.getenv('C_ALLOW_INCLUDES', '').split(',') if name.strip()]
+    C_MAX_FOPEN = int(os.getenv('C_MAX_FOPEN', '3'))
+
+    # Grading Model Configuration
+    SUMMARIZER_MODEL = os.getenv('SUMMARIZER_MODEL', 't5-large')
+    SUMMARIZER_BACKEND = os.getenv('SUMMARIZER_BACKEND', 'torch')  # torch, quantized or onnx
+    SUMMARIZER_NUM_BEAMS = int(os.getenv('SUMMARIZER_NUM_BEAMS', '4'))  # 1 = greedy decoding
+    SUMMARIZER_THREADS = int(os.getenv('SUMMARIZER_THREADS', '0'))  # 0 = library default
+    SENTENCE_MODEL = os.getenv('SENTENCE_MODEL', 'distilbert-base-nli-stsb-mean-tokens')
+    SENTENCE_BACKEND = os.getenv('SENTENCE_BACKEND', 'torch')  # torch, quantized or onnx
+    ENCODER_THREADS = int(os.getenv('ENCODER_THREADS', '0'))  # 0 = library default
+    # Padded tokens per length-bucketed batch in bulk grading paths (0 = fixed-size batches)
+    ENCODER_TOKEN_BUDGET = int(os.getenv('ENCODER_TOKEN_BUDGET', '8192'))
+    SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '4096'))
+    GRAMMAR_LANGUAGE = os.getenv('GRAMMAR_LANGUAGE', 'en-US')
+    GRAMMAR_POOL_SIZE = int(os.getenv('GRAMMAR_POOL_SIZE', '2'))  # local LanguageTool servers per process
+    GRAMMAR_TIMEOUT = int(os.getenv('GRAMMAR_TIMEOUT', '30'))  # seconds per check
+    GRAMMAR_CACHE_SIZE = int(os.getenv('GRAMMAR_CACHE_SIZE', '4096'))
+    GRADER_MODEL_PATH = os.getenv('GRADER_MODEL_PATH', 'answer_evaluation_model.pkl')
+    GRADER_TOKENIZER_PATH = os.getenv('GRADER_TOKENIZER_PATH', 'tokenizer.pkl')
+
+    # Startup Configuration
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'  # load models on a background thread at startup
+    WARMUP_MODELS = [name.strip() for name in os.getenv(
+        'WARMUP_MODELS', 'sentence_model,grammar_tool,summarizer').split(',') if name.strip()]
+    STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '1.0'))
+    # Load models before gunicorn forks so workers share them copy-on-write (see gunicorn.conf.py)
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+    PRELOAD_MODEL_NAMES = [name.strip() for name in os.getenv(
+        'PRELOAD_MODEL_NAMES', 'summarizer,sentence_model').split(',') if name.strip()]
+
+    # Embedding Cache Configuration
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache')
+    EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '1024'))
+    SUMMARY_CACHE_PATH = os.getenv('SUMMARY_CACHE_PATH', os.path.join('summary_cache', 'summaries.sqlite3'))
+    SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', '2048'))
+
+    # Grading Queue Configuration
+    GRADING_WORKERS = int(os.getenv('GRADING_WORKERS', '2'))
+    GRADING_JOB_TIMEOUT = int(os.getenv('GRADING_JOB_TIMEOUT', '600'))  # seconds before a queued job is considered lost
+    PAPER_GRADING_WORKERS = int(os.getenv('PAPER_GRADING_WORKERS', '1'))  # whole-paper jobs run one at a time
+    # Maximum concurrent users of each model across all worker processes, e.g. "summarizer=1,sentence_model=2"
+    MODEL_CONCURRENCY = {
+        name.strip(): int(limit)
+        for name, limit in (item.split('=') for item in os.getenv(
+            'MODEL_CONCURRENCY', 'summarizer=1,sentence_model=2,grammar_tool=2').split(',') if item.strip())
+    }
+    MODEL_LOCK_DIR = os.getenv('MODEL_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'assessment-model-slots'))
+
+    # Plagiarism Detection Configuration
+    PLAGIARISM_THRESHOLD = float(os.getenv('PLAGIARISM_THRESHOLD', '90'))  # similarity percentage
+    PLAGIARISM_ANN_THRESHOLD = int(os.getenv('PLAGIARISM_ANN_THRESHOLD', '5000'))  # answers before switching to faiss
+
+    # Instrumentation Configuration
+    TIMING_HEADER = os.getenv('TIMING_HEADER', 'false').lower() == 'true'  # add a Server-Timing header to responses
+    TIMING_LOG = os.getenv('TIMING_LOG', 'false').lower() == 'true'  # log one timing line per request
@@ -0,0 +1,138 @@
+"""
+Persistent store for sentence embeddings of model answers, and of student
+answers compared by the plagiarism report.
+
+Embeddings are keyed by (encoder name, SHA-256 of the text). A small
+in-memory LRU sits in front of an on-disk directory of float32 `.npy` files,
+which are opened memory-mapped so that every process reading the same file
+shares its pages.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import Config
+from model_registry import get_sentence_model
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, encoder_name, cache_dir, max_entries=1024):
+        self.encoder_name = encoder_name
+        self.max_entries = max_entries
+        self.directory = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', encoder_name))
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.npy")
+
+    def _remember(self, digest, vector):
+        with self._lock:
+            self._memory[digest] = vector
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, text):
+        """Return the stored embedding for `text`, or None if it is not cached."""
+        digest = text_hash(text)
+        with self._lock:
+            vector = self._memory.get(digest)
+            if vector is not None:
+                self._memory.move_to_end(digest)
+                self.hits += 1
+                return vector
+
+        path = self._path(digest)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        try:
+            vector = np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable embedding {path}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._remember(digest, vector)
+        return vector
+
+    def put(self, text, vector):
+        """Store the embedding for `text` in memory and on disk."""
+        digest = text_hash(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial array
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, vector)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._remember(digest, vector)
+        return vector
+
+    def get_or_encode(self, texts, encode_fn):
+        """
+        Return embeddings for a list of texts, encoding only the ones that are
+        not already stored. `encode_fn` receives the missing texts as a list.
+        """
+        vectors = [self.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = dict(zip(missing, (self.put(t, v) for t, v in zip(missing, encode_fn(missing)))))
+            vectors = [vector if vector is not None else encoded[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def stats(self):
+        return {'encoder': self.encoder_name, 'entries_in_memory': len(self._memory),
+                'hits': self.hits, 'misses': self.misses}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Return the process-wide store for the configured sentence encoder."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                encoder_name = f"{Config.SENTENCE_MODEL}:{Config.SENTENCE_BACKEND}"
+                _store = EmbeddingStore(encoder_name, Config.EMBEDDING_CACHE_DIR, Config.EMBEDDING_CACHE_SIZE)
+    return _store
+
+
+def get_embeddings(texts):
+    """Return embeddings for a list of texts, encoding any that are missing."""
+    return get_embedding_store().get_or_encode(texts, lambda missing: get_sentence_model().encode_many(missing))
+
+
+def get_model_answer_embeddings(model_answers):
+    """Return embeddings for a list of model answers, encoding any that are missing."""
+    return get_embeddings(model_answers)
+
+
+def get_model_answer_embedding(model_answer):
+    return get_model_answer_embeddings([model_answer])[0]
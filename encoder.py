@@ -0,0 +1,144 @@
+"""
+Sentence encoder backends for similarity scoring.
+
+The encoder used by `calculate_similarity` is chosen through Config:
+
+- SENTENCE_MODEL: a sentence-transformers checkpoint
+- SENTENCE_BACKEND: 'torch' (SentenceTransformer in eager mode), 'quantized'
+  (the same model with dynamic int8 quantization of its Linear layers) or
+  'onnx' (ONNX Runtime export through the optional `optimum[onnxruntime]`
+  package, with mean pooling done in NumPy)
+- ENCODER_THREADS: intra-op threads. For the torch backends this sets the
+  process-wide PyTorch thread count; ONNX Runtime applies it per session.
+
+Run `python encoder_parity.py` to check a backend against the reference
+model before switching to it.
+"""
+import logging
+
+import numpy as np
+
+from batching import run_bucketed
+
+BACKENDS = ('torch', 'quantized', 'onnx')
+
+
+class SentenceEncoder:
+    max_seq_length = 128
+
+    def __init__(self, model_name, backend, token_budget=0):
+        self.model_name = model_name
+        self.backend = backend
+        # When set, batches are length-bucketed and capped at this many padded tokens
+        self.token_budget = token_budget
+
+    @property
+    def name(self):
+        """Identifies the embedding space; embeddings from different names are not comparable."""
+        return f"{self.model_name}:{self.backend}"
+
+    def _encode_batch(self, texts):
+        raise NotImplementedError
+
+    def _tokenizer(self):
+        raise NotImplementedError
+
+    def token_lengths(self, texts):
+        """Number of tokens each text will occupy after truncation."""
+        encoded = self._tokenizer()(list(texts), max_length=self.max_seq_length, truncation=True)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def encode_many(self, texts, batch_size=32, normalize_embeddings=False):
+        """
+        Encode a list of texts into a float32 matrix with one row per text.
+        With a token budget, `batch_size` caps the number of texts per
+        length bucket; without one it is a fixed batch size.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.token_budget:
+            rows = run_bucketed(texts, lambda batch: list(self._encode_batch(batch)),
+                                self.token_lengths(texts), self.token_budget, max_batch_size=batch_size)
+        else:
+            rows = [self._encode_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+        embeddings = np.vstack(rows).astype(np.float32, copy=False)
+        if normalize_embeddings:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        """Same contract as `SentenceTransformer.encode`: a single string gives a single vector."""
+        if isinstance(texts, str):
+            return self.encode_many([texts], normalize_embeddings=normalize_embeddings)[0]
+        return self.encode_many(list(texts), batch_size=batch_size, normalize_embeddings=normalize_embeddings)
+
+
+class TorchSentenceEncoder(SentenceEncoder):
+    def __init__(self, model_name, backend, model, token_budget=0):
+        super().__init__(model_name, backend, token_budget)
+        self.model = model
+        self.max_seq_length = getattr(model, 'max_seq_length', None) or self.max_seq_length
+
+    def _tokenizer(self):
+        return self.model.tokenizer
+
+    def _encode_batch(self, texts):
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+class OnnxSentenceEncoder(SentenceEncoder):
+    def __init__(self, model_name, model, tokenizer, token_budget=0):
+        super().__init__(model_name, 'onnx', token_budget)
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def _tokenizer(self):
+        return self.tokenizer
+
+    def _encode_batch(self, texts):
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors='np')
+        token_embeddings = self.model(**inputs).last_hidden_state
+        token_embeddings = np.asarray(token_embeddings)
+
+        # Mean pooling over real tokens, as in the sentence-transformers model config
+        mask = inputs['attention_mask'][..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def load_encoder(model_name, backend='torch', threads=0, token_budget=0):
+    """
+    Build a SentenceEncoder for the given checkpoint and backend. A non-zero
+    `token_budget` enables length-bucketed batching in `encode_many`.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == 'onnx':
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+        except ImportError:
+            raise RuntimeError("The 'onnx' encoder backend requires: pip install optimum[onnxruntime]")
+        from transformers import AutoTokenizer
+
+        # sentence-transformers resolves bare names under its own organisation
+        repo_id = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        model = ORTModelForFeatureExtraction.from_pretrained(repo_id, export=True, session_options=session_options)
+        encoder = OnnxSentenceEncoder(model_name, model, AutoTokenizer.from_pretrained(repo_id), token_budget)
+    else:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(model_name)
+        model.eval()
+        if backend == 'quantized':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        encoder = TorchSentenceEncoder(model_name, backend, model, token_budget)
+
+    logging.info(f"Sentence encoder ready: {encoder.name}")
+    return encoder
@@ -0,0 +1,84 @@
+"""
+Parity check for sentence encoder backends.
+
+Scores every (model answer, student answer) pair in the bundled evaluation
+dataset with the reference backend and each candidate backend, then reports
+how far the candidate's similarity percentages drift from the reference and
+how fast each backend encodes. Exits non-zero if any candidate exceeds the
+tolerance.
+
+Usage: python encoder_parity.py --backends quantized,onnx --tolerance 2.0
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from config import Config
+from encoder import load_encoder
+from utils import load_dataset
+
+
+def similarity_scores(encoder, model_answers, student_answers, batch_size):
+    """Return (similarity percentages, encoded texts per second) for aligned answer lists."""
+    start = time.perf_counter()
+    enc_models = encoder.encode_many(model_answers, batch_size=batch_size, normalize_embeddings=True)
+    enc_students = encoder.encode_many(student_answers, batch_size=batch_size, normalize_embeddings=True)
+    elapsed = time.perf_counter() - start
+    scores = np.einsum('ij,ij->i', enc_models, enc_students) * 100
+    return scores, (len(model_answers) + len(student_answers)) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare encoder backends against the reference model.')
+    parser.add_argument('--dataset', default='student_evaluation_results (2).csv')
+    parser.add_argument('--model', default=Config.SENTENCE_MODEL)
+    parser.add_argument('--reference', default='torch', help='Reference backend')
+    parser.add_argument('--backends', default='quantized,onnx', help='Comma-separated candidate backends')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='Maximum allowed absolute difference in similarity percentage points')
+    parser.add_argument('--threads', type=int, default=Config.ENCODER_THREADS)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    df = load_dataset(args.dataset).dropna(subset=['Answers', 'Student_Answer'])
+    model_answers = df['Answers'].astype(str).tolist()
+    student_answers = df['Student_Answer'].astype(str).tolist()
+
+    reference = load_encoder(args.model, args.reference, threads=args.threads)
+    reference_scores, reference_rate = similarity_scores(reference, model_answers, student_answers, args.batch_size)
+    print(f"{reference.name:<50} {reference_rate:>8.1f} texts/s  (reference, {len(model_answers)} pairs)")
+
+    report = {'pairs': len(model_answers), 'reference': reference.name,
+              'reference_texts_per_second': round(reference_rate, 2), 'tolerance': args.tolerance, 'candidates': []}
+    failed = False
+    for backend in args.backends.split(','):
+        candidate = load_encoder(args.model, backend.strip(), threads=args.threads)
+        scores, rate = similarity_scores(candidate, model_answers, student_answers, args.batch_size)
+        diff = np.abs(scores - reference_scores)
+        passed = bool(diff.max() <= args.tolerance)
+        failed = failed or not passed
+
+        report['candidates'].append({
+            'encoder': candidate.name,
+            'texts_per_second': round(rate, 2),
+            'speedup': round(rate / reference_rate, 2),
+            'max_abs_diff': round(float(diff.max()), 4),
+            'mean_abs_diff': round(float(diff.mean()), 4),
+            'p95_abs_diff': round(float(np.percentile(diff, 95)), 4),
+            'passed': passed,
+        })
+        print(f"{candidate.name:<50} {rate:>8.1f} texts/s  x{rate / reference_rate:.2f}  "
+              f"max diff {diff.max():.3f}  mean diff {diff.mean():.3f}  {'PASS' if passed else 'FAIL'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Bulk grader for C lab submissions.
+
+Takes a directory or .zip of .c files (one per student, named after the
+student) and, optionally, a directory of test cases stored as `NAME.in` /
+`NAME.out` pairs. Every submission is security-scanned, compiled, run and
+scored on a process pool sized to the machine, and progress is printed as
+submissions finish. The gradebook is written as CSV or JSON depending on the
+--output extension. Each result is also appended to OUTPUT.partial as soon as
+it is known, so an interrupted run loses nothing. With --resume, submissions
+already in the gradebook or in OUTPUT.partial are not graded again, as long
+as they were graded against the same test cases and reference budget;
+identical files within one run are also graded only once. With --reference, a model solution is run
+first and its CPU time and peak memory become the budget that
+C_PERFORMANCE_MARKS compares submissions against.
+
+Usage:
+    python grade_c_submissions.py lab3.zip --tests tests/lab3 --output lab3.csv
+    python grade_c_submissions.py submissions/ --output lab3.json --resume
+    python grade_c_submissions.py lab3.zip --tests tests/lab3 --reference lab3_solution.c
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+
+from models import CTestCase
+from utils import validate_c_code, grade_c_submission, measure_reference_solution
+
+FIELDS = ('submission', 'sha256', 'run_key', 'status', 'marks', 'passed_cases', 'total_cases', 'cpu_seconds',
+          'max_rss_kb', 'seconds', 'message')
+
+
+def load_submissions(path):
+    """Return [(name, source)] for every .c file in a directory or zip archive."""
+    submissions = []
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if member.endswith('.c') and not member.startswith('__MACOSX/'):
+                    submissions.append((member, archive.read(member).decode('utf-8', errors='replace')))
+    else:
+        for root, _, files in os.walk(path):
+            for filename in files:
+                if filename.endswith('.c'):
+                    file_path = os.path.join(root, filename)
+                    with open(file_path, encoding='utf-8', errors='replace') as f:
+                        submissions.append((os.path.relpath(file_path, path), f.read()))
+    return sorted(submissions)
+
+
+def load_test_cases(directory):
+    """Return [(input_text, expected_output)] for each NAME.in/NAME.out pair."""
+    cases = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.in'):
+            continue
+        expected_path = os.path.join(directory, filename[:-3] + '.out')
+        if not os.path.exists(expected_path):
+            print(f"warning: {filename} has no matching .out file, skipped", file=sys.stderr)
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            input_text = f.read()
+        with open(expected_path, encoding='utf-8') as f:
+            cases.append((input_text, f.read()))
+    return cases
+
+
+def grade_submission(name, source, cases, budget=None):
+    """Grade one submission; runs in a pool worker process."""
+    start = time.perf_counter()
+    row = {'submission': name, 'sha256': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+           'passed_cases': None, 'total_cases': len(cases) or None, 'cpu_seconds': None, 'max_rss_kb': None}
+
+    is_valid, validation_message = validate_c_code(source)
+    if not is_valid:
+        row.update(status='Rejected', marks=0, message=validation_message)
+    else:
+        budget = budget or {}
+        question = SimpleNamespace(
+            test_cases=[CTestCase(input_text=input_text, expected_output=expected, weight=1.0)
+                        for input_text, expected in cases],
+            reference_cpu_seconds=budget.get('cpu_seconds'), reference_max_rss_kb=budget.get('max_rss_kb'))
+        result = grade_c_submission(source, question=question)
+        message = result['message']
+        if isinstance(message, dict):
+            message = '; '.join(message['error_messages'][:3])
+        elif result['status'] == 'Success' and not cases:
+            message = ''
+        if result['test_results']:
+            row['passed_cases'] = sum(case['passed'] for case in result['test_results'])
+        profile = result['profile'] or {}
+        row.update(status=result['status'], marks=result['marks'], message=message,
+                   cpu_seconds=profile.get('cpu_seconds'), max_rss_kb=profile.get('max_rss_kb'))
+
+    row['seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def grading_run_key(cases, reference_source):
+    """
+    Hash of what marks depend on besides the submission: the test cases and
+    the reference solution (its source, since measured budgets vary slightly
+    between runs).
+    """
+    settings = json.dumps({'cases': cases, 'reference': reference_source}, sort_keys=True)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]
+
+
+def read_journal(path):
+    """Rows appended by an earlier, possibly interrupted, run."""
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, 'rb+') as f:
+        # End a row cut off by the interruption so new rows start on their own line
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # The run was killed while writing this row
+                continue
+    return rows
+
+
+def read_gradebook(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return list(csv.DictReader(f))
+
+
+def write_gradebook(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            json.dump(rows, f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade a folder or zip of C submissions.')
+    parser.add_argument('submissions', help='Directory or .zip of .c files')
+    parser.add_argument('--tests', help='Directory of NAME.in / NAME.out test case pairs')
+    parser.add_argument('--output', default='gradebook.csv', help='Gradebook path (.csv or .json)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Reuse results already in --output or its .partial file for the same tests and reference')
+    parser.add_argument('--reference', help='Reference solution whose resource usage is the budget')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Grading processes')
+    args = parser.parse_args()
+
+    submissions = load_submissions(args.submissions)
+    cases = load_test_cases(args.tests) if args.tests else []
+    budget = reference_source = None
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as f:
+            reference_source = f.read()
+        reference_cases = [CTestCase(input_text=input_text, expected_output=expected, weight=1.0)
+                           for input_text, expected in cases]
+        budget = measure_reference_solution(reference_source, reference_cases)
+        print(f"Reference budget: {budget['cpu_seconds']:.3f}s CPU, {budget['max_rss_kb']} KB peak memory", flush=True)
+    run_key = grading_run_key(cases, reference_source)
+    journal = args.output + '.partial'
+    previous = {}
+    if args.resume:
+        for row in read_gradebook(args.output) + read_journal(journal):
+            if row.get('run_key') == run_key and row.get('status') != 'Grader Error':
+                previous[row['sha256']] = row
+
+    # Identical files are graded once and their result shared
+    by_hash = {}
+    for name, source in submissions:
+        by_hash.setdefault(hashlib.sha256(source.encode('utf-8')).hexdigest(), []).append((name, source))
+    pending = {digest: entries[0] for digest, entries in by_hash.items() if digest not in previous}
+    print(f"{len(submissions)} submissions, {len(by_hash)} distinct, {len(pending)} to grade, "
+          f"{len(cases)} test cases, {args.workers} workers", flush=True)
+
+    results = {digest: previous[digest] for digest in by_hash if digest in previous}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, \
+            open(journal, 'a' if args.resume else 'w', encoding='utf-8') as journal_file:
+        futures = {executor.submit(grade_submission, name, source, cases, budget): digest
+                   for digest, (name, source) in pending.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            digest = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                row = {'submission': pending[digest][0], 'sha256': digest, 'status': 'Grader Error', 'marks': None,
+                       'passed_cases': None, 'total_cases': None, 'cpu_seconds': None, 'max_rss_kb': None,
+                       'seconds': None, 'message': str(e)}
+            row['run_key'] = run_key
+            results[digest] = row
+            journal_file.write(json.dumps(row) + '\n')
+            journal_file.flush()
+            print(f"[{done}/{len(pending)}] {row['submission']}: {row['status']} ({row['marks']} marks)", flush=True)
+
+    rows = [dict(results[digest], submission=name)
+            for digest, entries in by_hash.items() for name, _ in entries]
+    rows.sort(key=lambda row: row['submission'])
+    write_gradebook(args.output, rows)
+    os.remove(journal)
+    print(f"Graded {len(pending)} submissions in {time.perf_counter() - start:.1f}s; gradebook written to "
+          f"{args.output}")
+
+
+if __name__ == '__main__':
+    main()
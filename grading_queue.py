@@ -0,0 +1,87 @@
+"""
+Background grading jobs for descriptive answers.
+
+Jobs for single answers are recorded in the `grading_jobs` table and jobs for
+whole question papers in `paper_grading_jobs`. Both execute on small local
+thread pools, so a request only has to enqueue work and can return straight
+away. Model concurrency is bounded separately by `model_registry.model_slot`,
+which every grading stage acquires.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+
+from batch_grading import grade_paper
+from config import Config
+from job_runner import JobRunner, ACTIVE_STATUSES, job_to_dict as _job_to_dict
+from models import GradingJob, PaperGradingJob
+from utils import grade_answer
+
+
+def _grade(job):
+    grade_answer(job.student_id, job.question_id, force=job.force)
+
+
+def _grade_paper(job):
+    job.report = json.dumps(grade_paper(job.paper_id, force=job.force))
+
+
+_runner = JobRunner(GradingJob, _grade, Config.GRADING_WORKERS, 'grading')
+_paper_runner = JobRunner(PaperGradingJob, _grade_paper, Config.PAPER_GRADING_WORKERS, 'paper-grading')
+
+
+def find_active_job(student_id, question_id):
+    """Return a queued or running job for this answer that has not gone stale."""
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.GRADING_JOB_TIMEOUT)
+    return GradingJob.query.filter(
+        GradingJob.student_id == student_id,
+        GradingJob.question_id == question_id,
+        GradingJob.status.in_(ACTIVE_STATUSES),
+        GradingJob.created_at >= cutoff
+    ).order_by(GradingJob.id.desc()).first()
+
+
+def submit_grading_job(student_id, question_id, force=False):
+    """
+    Queue grading for one answer and return its job. If the answer is already
+    queued or being graded, the existing job is returned instead.
+    """
+    job = find_active_job(student_id, question_id)
+    if job:
+        return job
+
+    job = _runner.submit(GradingJob(student_id=student_id, question_id=question_id, force=force))
+    logging.info(f"Queued grading job {job.id} for student {student_id}, question {question_id}")
+    return job
+
+
+def submit_paper_grading_job(paper_id, force=False):
+    """
+    Queue grading for every answer to a paper and return its job, or the
+    paper's existing queued or running job.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.GRADING_JOB_TIMEOUT)
+    job = PaperGradingJob.query.filter(
+        PaperGradingJob.paper_id == paper_id,
+        PaperGradingJob.status.in_(ACTIVE_STATUSES),
+        PaperGradingJob.created_at >= cutoff
+    ).order_by(PaperGradingJob.id.desc()).first()
+    if job:
+        return job
+
+    job = _paper_runner.submit(PaperGradingJob(paper_id=paper_id, force=force))
+    logging.info(f"Queued grading job {job.id} for paper {paper_id}")
+    return job
+
+
+def paper_job_to_dict(job):
+    data = _job_to_dict(job, 'paper_id')
+    data['force'] = bool(job.force)
+    data['report'] = json.loads(job.report) if job.report else None
+    return data
+
+
+def job_to_dict(job):
+    data = _job_to_dict(job, 'student_id', 'question_id')
+    data['force'] = bool(job.force)
+    return data
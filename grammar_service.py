@@ -0,0 +1,153 @@
+"""
+Pooled LanguageTool grammar checking.
+
+Every `language_tool_python.LanguageTool` instance runs its own local
+LanguageTool server (a JVM). The service keeps a small pool of them, spreads
+checks across the pool, caches mistake counts by text hash and applies a
+timeout to each check so that a hung server fails a single answer instead of
+the whole request. A server that times out or errors is shut down and
+replaced on the next check.
+"""
+import hashlib
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class GrammarService:
+    def __init__(self, language='en-US', pool_size=2, timeout=30, cache_size=4096):
+        self.language = language
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='grammar')
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _new_tool(self):
+        import language_tool_python
+
+        tool = language_tool_python.LanguageTool(self.language)
+        # The client waits up to five minutes on the server by default
+        tool._TIMEOUT = self.timeout
+        return tool
+
+    def _acquire_tool(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._new_tool()
+            except Exception:
+                with self._pool_lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def _discard_tool(self, tool):
+        with self._pool_lock:
+            self._created -= 1
+        try:
+            tool.close()
+        except Exception as e:
+            logging.warning(f"Error shutting down LanguageTool server: {e}")
+
+    def _count_mistakes(self, text):
+        tool = self._acquire_tool()
+        try:
+            count = len(tool.check(text))
+        except Exception:
+            self._discard_tool(tool)
+            raise
+        self._idle.put(tool)
+        return count
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.language}\0{text}".encode('utf-8')).hexdigest()
+
+    def _cached(self, key):
+        with self._cache_lock:
+            count = self._cache.get(key)
+            if count is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return count
+
+    def _store(self, key, count):
+        with self._cache_lock:
+            self._cache[key] = count
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def check(self, text):
+        """Return the number of grammar mistakes in `text`, or None if the check failed."""
+        return self.check_many([text])[0]
+
+    def check_many(self, texts):
+        """
+        Return mistake counts for a list of texts, in order. Identical texts
+        are checked once; a text whose check fails or times out gets None.
+        """
+        keys = [self._key(text or "") for text in texts]
+        results = {}
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key in results or key in pending:
+                continue
+            count = self._cached(key)
+            if count is not None:
+                results[key] = count
+            else:
+                pending[key] = self._executor.submit(self._count_mistakes, text or "")
+
+        for key, future in pending.items():
+            try:
+                # Futures queue behind the pool, so allow for the checks ahead of this one
+                count = future.result(timeout=self.timeout * (1 + len(pending) // self.pool_size))
+            except TimeoutError:
+                logging.error(f"Grammar check timed out after {self.timeout}s")
+                results[key] = None
+                continue
+            except Exception as e:
+                logging.error(f"Error counting grammar mistakes: {e}")
+                results[key] = None
+                continue
+            self._store(key, count)
+            results[key] = count
+
+        return [results[key] for key in keys]
+
+    def stats(self):
+        return {
+            'servers': self._created,
+            'pool_size': self.pool_size,
+            'cache_entries': len(self._cache),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        while True:
+            try:
+                tool = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard_tool(tool)
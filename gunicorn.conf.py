@@ -0,0 +1,38 @@
+"""
+Gunicorn settings for serving the assessment app.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+With PRELOAD_MODELS=true the app (and the models listed in
+PRELOAD_MODEL_NAMES) is imported once in the master and workers are forked
+from it, so model weights are shared copy-on-write instead of being loaded
+again by every worker. Models are put in eval mode with gradients disabled
+and the garbage collector is frozen before the fork, which keeps the shared
+pages from being written to. Run `python memory_report.py` against the
+master to see how much of each worker is actually shared.
+
+The grammar checker, the Keras grader and any model configured with the onnx
+backend (SUMMARIZER_BACKEND or SENTENCE_BACKEND) are never preloaded: the
+grammar checker drives LanguageTool servers through a thread pool, loading
+the Keras model starts TensorFlow's thread pools, an onnxruntime session
+starts its own, and threads do not survive fork. Workers load them on first
+use instead.
+"""
+import logging
+import os
+
+from config import Config
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+pidfile = os.getenv('GUNICORN_PIDFILE', 'gunicorn.pid')
+preload_app = Config.PRELOAD_MODELS
+
+
+def post_fork(server, worker):
+    if preload_app and Config.SUMMARIZER_THREADS:
+        # Each worker gets its own intra-op thread pool
+        import torch
+        torch.set_num_threads(Config.SUMMARIZER_THREADS)
+    logging.info(f"Worker {worker.pid} forked (preloaded models: {preload_app})")
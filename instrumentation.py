@@ -0,0 +1,201 @@
+"""
+Lightweight in-process timing instrumentation.
+
+Grading stages, SQL queries, gcc/program subprocesses and HTTP requests are
+timed into histograms that the `/metrics` route exposes in the Prometheus
+text format. Metrics are per process; under gunicorn each worker reports its
+own values.
+
+Use `timed('stage')` as a context manager or `timed_stage('stage')` as a
+decorator. Within a request, stage timings are also collected so they can be
+sent back in a `Server-Timing` header (Config.TIMING_HEADER) or logged
+(Config.TIMING_LOG).
+"""
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from config import Config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+def _get_or_create(cls, name, description, **kwargs):
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, description, **kwargs)
+        return metric
+
+
+def histogram(name, description, buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, description, buckets=buckets)
+
+
+def counter(name, description):
+    return _get_or_create(Counter, name, description)
+
+
+STAGE_SECONDS = histogram('grading_stage_seconds', 'Time spent in each grading or compilation stage')
+DB_QUERY_SECONDS = histogram('db_query_seconds', 'Time spent executing SQL statements')
+REQUEST_SECONDS = histogram('http_request_seconds', 'Time spent handling HTTP requests')
+STAGE_ERRORS = counter('grading_stage_errors_total', 'Stages that raised an exception')
+
+
+def _record_request_timing(name, elapsed):
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block into the `grading_stage_seconds` histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        _record_request_timing(stage, elapsed)
+
+
+def timed_stage(stage):
+    """Decorator form of `timed`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_prometheus():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_sqlalchemy(engine):
+    """Time every statement executed on `engine`."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+        DB_QUERY_SECONDS.observe(elapsed, operation=operation)
+        _record_request_timing('db', elapsed)
+
+
+def init_app(app, db):
+    """Time requests and SQL queries for a Flask app."""
+    with app.app_context():
+        instrument_sqlalchemy(db.engine)
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_start_time = time.perf_counter()
+
+    @app.after_request
+    def _finish_request_timer(response):
+        start = g.pop('request_start_time', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or 'unknown', method=request.method,
+                                status=response.status_code)
+
+        timings = g.get('stage_timings', {})
+        if Config.TIMING_HEADER:
+            parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+            parts.append(f"total;dur={elapsed * 1000:.1f}")
+            response.headers['Server-Timing'] = ', '.join(parts)
+        if Config.TIMING_LOG:
+            breakdown = ' '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items())
+            logging.info(f"{request.method} {request.path} {response.status_code} "
+                         f"{elapsed * 1000:.1f}ms {breakdown}".rstrip())
+        return response
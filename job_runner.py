@@ -0,0 +1,82 @@
+"""
+Shared plumbing for the background job tables.
+
+A job is a database row with `status`, `error` and created/started/finished
+timestamps. `JobRunner` queues new rows on a lazily created local thread
+pool and runs them inside an app context, recording the status, timestamps
+and any error, so each queue module only supplies the work itself.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+
+from models import db
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobRunner:
+    """Runs rows of the `model` job table with `work(job)` on up to `max_workers` threads."""
+
+    def __init__(self, model, work, max_workers, name):
+        self.model = model
+        self.work = work
+        self.max_workers = max_workers
+        self.name = name
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix=self.name)
+        return self._executor
+
+    def _run(self, app, job_id):
+        with app.app_context():
+            job = db.session.get(self.model, job_id)
+            if job is None:
+                return
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+
+            try:
+                self.work(job)
+                job.status = 'done'
+            except Exception as e:
+                logging.error(f"{self.name} job {job_id} failed: {e}")
+                db.session.rollback()
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                db.session.remove()
+
+    def submit(self, job):
+        """Save a new job row as queued, start it in the background and return it."""
+        job.status = 'queued'
+        db.session.add(job)
+        db.session.commit()
+        self._get_executor().submit(self._run, current_app._get_current_object(), job.id)
+        return job
+
+
+def job_to_dict(job, *fields):
+    """Status, error and timestamps of a job, plus the named `fields`."""
+    data = {'id': job.id}
+    data.update((field, getattr(job, field)) for field in fields)
+    data.update({
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+    return data
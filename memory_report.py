@@ -0,0 +1,73 @@
+"""
+Report how much memory gunicorn workers share with their master.
+
+For the master and each of its workers, prints RSS, PSS, shared and private
+(unique) memory read from /proc/<pid>/smaps_rollup. With PRELOAD_MODELS=true
+most of the model weights should show up as shared; if private memory grows
+towards the RSS over time, pages are being copied after the fork.
+
+Usage:
+    python memory_report.py                 # reads gunicorn.pid
+    python memory_report.py --pid 12345
+"""
+import argparse
+import json
+import os
+
+from model_registry import process_memory
+
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return sorted(children)
+
+
+def collect(master_pid):
+    processes = [('master', master_pid)] + [('worker', pid) for pid in child_pids(master_pid)]
+    rows = []
+    for role, pid in processes:
+        try:
+            rows.append(dict(role=role, pid=pid, **process_memory(pid)))
+        except OSError:
+            # The worker exited while we were reading
+            continue
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show shared vs unique memory of gunicorn workers.')
+    parser.add_argument('--pid', type=int, help='Gunicorn master pid')
+    parser.add_argument('--pidfile', default=os.getenv('GUNICORN_PIDFILE', 'gunicorn.pid'))
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    master_pid = args.pid
+    if master_pid is None:
+        with open(args.pidfile) as f:
+            master_pid = int(f.read().strip())
+
+    rows = collect(master_pid)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    mib = 2 ** 20
+    print(f"{'role':<8}{'pid':>8}{'RSS MiB':>10}{'PSS MiB':>10}{'shared MiB':>12}{'unique MiB':>12}")
+    for row in rows:
+        print(f"{row['role']:<8}{row['pid']:>8}{row['rss_bytes'] / mib:>10.1f}{row['pss_bytes'] / mib:>10.1f}"
+              f"{row['shared_bytes'] / mib:>12.1f}{row['private_bytes'] / mib:>12.1f}")
+    # PSS splits shared pages between the processes mapping them, so its sum is
+    # the real footprint of the whole server
+    total_pss = sum(row['pss_bytes'] for row in rows)
+    total_rss = sum(row['rss_bytes'] for row in rows)
+    print(f"total PSS {total_pss / mib:.1f} MiB (RSS sum {total_rss / mib:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Database migration script for the Assessment System
+Brings an existing database up to date with models.py without losing data
+"""
+
+from flask import Flask
+from sqlalchemy import inspect, text
+from models import db
+from config import Config
+import argparse
+import sys
+
+def pending_migrations():
+    """
+    Return (missing tables, ALTER TABLE statements) needed to match models.py.
+    Tables are created with db.create_all(); columns are added as nullable,
+    since existing rows have no value for them.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = db.engine.dialect.identifier_preparer
+
+    missing_tables, statements = [], []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            missing_tables.append(table.name)
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                statements.append(f"ALTER TABLE {preparer.quote(table.name)} "
+                                  f"ADD COLUMN {preparer.quote(column.name)} {column_type}")
+    return missing_tables, statements
+
+def migrate_database(dry_run=False):
+    """Create missing tables and add missing columns"""
+    print("🔧 Migrating database...")
+
+    try:
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        db.init_app(app)
+
+        with app.app_context():
+            print(f"📡 Connecting to database: {Config.SQLALCHEMY_DATABASE_URI[:50]}...")
+            missing_tables, statements = pending_migrations()
+
+            if not missing_tables and not statements:
+                print("✅ Database is up to date.")
+                return
+
+            for table in missing_tables:
+                print(f"🏗️ Create table {table}")
+            for statement in statements:
+                print(f"🔨 {statement};")
+            if dry_run:
+                print("ℹ️ Dry run, nothing was changed.")
+                return
+
+            # create_all() only creates tables that do not exist yet
+            db.create_all()
+            with db.engine.begin() as connection:
+                for statement in statements:
+                    connection.execute(text(statement))
+
+            print(f"🎉 Created {len(missing_tables)} tables and added {len(statements)} columns.")
+
+    except Exception as e:
+        print(f"❌ Error migrating database: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add tables and columns that models.py declares but the database lacks.')
+    parser.add_argument('--dry-run', action='store_true', help='Print the changes without applying them')
+    migrate_database(parser.parse_args().dry_run)
@@ -0,0 +1,280 @@
+"""
+Process-wide registry for the heavy ML models used during grading.
+
+Each model is loaded lazily the first time it is requested and then kept for
+the lifetime of the process, so request handlers never pay the load cost more
+than once. Loading is guarded by a per-model lock, which means concurrent
+requests wait for a single load instead of racing to build their own copies.
+"""
+import fcntl
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+_MISSING = object()
+# Models whose loading starts threads (TensorFlow, the LanguageTool pool); they must load after fork
+FORK_UNSAFE_MODELS = ('grader', 'grammar_tool')
+
+
+def fork_unsafe_models():
+    """
+    Return the models that must not be loaded before fork. Besides
+    FORK_UNSAFE_MODELS this includes every model configured for the onnx
+    backend, since building an onnxruntime session starts its thread pools.
+    """
+    backends = {'summarizer': Config.SUMMARIZER_BACKEND, 'sentence_model': Config.SENTENCE_BACKEND}
+    return FORK_UNSAFE_MODELS + tuple(name for name, backend in backends.items() if backend == 'onnx')
+
+
+def _current_rss_bytes():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is a high-water mark (KiB on Linux) but is the best we
+        # have on platforms without /proc.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory(pid='self'):
+    """
+    Return RSS, PSS and the shared/private split for a process in bytes, from
+    /proc/<pid>/smaps_rollup. Private memory is what the process would free
+    if it exited; shared memory is mapped by other processes as well, for
+    example pages a forked worker still shares with its master.
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss_bytes': fields.get('Rss', 0),
+        'pss_bytes': fields.get('Pss', 0),
+        'shared_bytes': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private_bytes': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._load_locks = {}
+        self._models = {}
+        self._stats = {}
+        self._errors = {}
+        self._warm_up_models = ()
+
+    def register(self, name, loader):
+        """Register a zero-argument callable that builds the model called `name`."""
+        self._loaders[name] = loader
+        self._load_locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Return the model called `name`, loading it on first use."""
+        model = self._models.get(name, _MISSING)
+        if model is not _MISSING:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+
+        with self._load_locks[name]:
+            # Another thread may have finished loading while we waited.
+            model = self._models.get(name, _MISSING)
+            if model is not _MISSING:
+                return model
+
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                raise
+            self._errors.pop(name, None)
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+
+            self._stats[name] = {
+                'load_seconds': round(load_seconds, 3),
+                'rss_delta_bytes': rss_after - rss_before,
+                'loaded_at': time.time(),
+            }
+            self._models[name] = model
+            logging.info(f"Loaded model '{name}' in {load_seconds:.2f}s "
+                         f"(RSS +{(rss_after - rss_before) / 2**20:.1f} MiB)")
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def unload(self, name):
+        """Drop a loaded model so the next `get` reloads it."""
+        with self._load_locks[name]:
+            self._models.pop(name, None)
+            self._stats.pop(name, None)
+
+    def warm_up(self, names):
+        """Load the given models now, logging rather than raising on failure."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Error warming up model '{name}': {e}")
+
+    def start_warm_up(self, names):
+        """Load the given models on a background daemon thread."""
+        self._warm_up_models = tuple(names)
+        thread = threading.Thread(target=self.warm_up, args=(self._warm_up_models,),
+                                  name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def preload(self, names):
+        """
+        Load models in the gunicorn master before workers are forked.
+
+        Workers then share the model pages copy-on-write. Everything allocated
+        so far is moved out of the garbage collector's reach with
+        `gc.freeze()`, because collections in the workers would otherwise
+        write to those objects and un-share their pages.
+        """
+        fork_unsafe = fork_unsafe_models()
+        unsafe = [name for name in names if name in fork_unsafe]
+        if unsafe:
+            logging.warning(f"Not preloading {', '.join(unsafe)}: they start threads that do not survive fork")
+        names = [name for name in names if name not in fork_unsafe]
+        self._warm_up_models = tuple(names)
+        for name in names:
+            model = self.get(name)
+            _make_read_only(model)
+        gc.collect()
+        gc.freeze()
+        logging.info(f"Preloaded models {', '.join(names)} for sharing across workers")
+
+    def is_ready(self):
+        """True once every model scheduled for warm-up has been loaded."""
+        return all(name in self._models for name in self._warm_up_models)
+
+    def stats(self):
+        """Return load-time and memory statistics for every registered model."""
+        try:
+            memory = process_memory()
+        except OSError:
+            memory = None
+        return {
+            'process_rss_bytes': _current_rss_bytes(),
+            'process_memory': memory,
+            'ready': self.is_ready(),
+            'models': {
+                name: dict(self._stats.get(name, {}), loaded=name in self._models,
+                           warm_up=name in self._warm_up_models, error=self._errors.get(name))
+                for name in self._loaders
+            },
+        }
+
+
+def _make_read_only(model):
+    """Switch torch modules inside a loaded model to inference-only parameters."""
+    for candidate in (model, getattr(model, 'model', None)):
+        parameters = getattr(candidate, 'parameters', None)
+        if callable(parameters) and hasattr(candidate, 'eval'):
+            candidate.eval()
+            for parameter in parameters():
+                parameter.requires_grad_(False)
+
+
+@contextmanager
+def model_slot(name, poll_interval=0.05):
+    """
+    Hold one of the `Config.MODEL_CONCURRENCY[name]` slots for a model while
+    the block runs.
+
+    Slots are lock files shared by every process on the machine, so the limit
+    applies across gunicorn workers and not only across threads.
+    """
+    slots = Config.MODEL_CONCURRENCY.get(name)
+    if not slots:
+        yield
+        return
+
+    os.makedirs(Config.MODEL_LOCK_DIR, exist_ok=True)
+    while True:
+        for slot in range(slots):
+            f = open(os.path.join(Config.MODEL_LOCK_DIR, f"{name}.{slot}.lock"), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+            return
+        time.sleep(poll_interval)
+
+
+def _load_summarizer():
+    from summarizer import load_summarizer
+
+    return load_summarizer(Config.SUMMARIZER_MODEL, Config.SUMMARIZER_BACKEND,
+                           num_beams=Config.SUMMARIZER_NUM_BEAMS, threads=Config.SUMMARIZER_THREADS)
+
+
+def _load_sentence_model():
+    from encoder import load_encoder
+
+    return load_encoder(Config.SENTENCE_MODEL, Config.SENTENCE_BACKEND, threads=Config.ENCODER_THREADS,
+                        token_budget=Config.ENCODER_TOKEN_BUDGET)
+
+
+def _load_grammar_tool():
+    from grammar_service import GrammarService
+
+    return GrammarService(Config.GRAMMAR_LANGUAGE, pool_size=Config.GRAMMAR_POOL_SIZE,
+                          timeout=Config.GRAMMAR_TIMEOUT, cache_size=Config.GRAMMAR_CACHE_SIZE)
+
+
+def _load_grader():
+    from utils import load_model, load_tokenizer
+
+    return load_model(Config.GRADER_MODEL_PATH), load_tokenizer(Config.GRADER_TOKENIZER_PATH)
+
+
+registry = ModelRegistry()
+registry.register('summarizer', _load_summarizer)
+registry.register('sentence_model', _load_sentence_model)
+registry.register('grammar_tool', _load_grammar_tool)
+registry.register('grader', _load_grader)
+
+
+def get_summarizer():
+    """Return the configured `summarizer.Summarizer` used by `calculate_summary`."""
+    return registry.get('summarizer')
+
+
+def get_sentence_model():
+    """Return the configured `encoder.SentenceEncoder` used for similarity scoring."""
+    return registry.get('sentence_model')
+
+
+def get_grammar_service():
+    """Return the pooled LanguageTool service used by `count_grammar_mistakes`."""
+    return registry.get('grammar_tool')
+
+
+def get_grader():
+    """Return the (keras model, tokenizer) pair used to predict marks."""
+    return registry.get('grader')
@@ -25,9 +25,15 @@ class Questions(db.Model):
     model_answer = db.Column(db.Text, nullable=False)
     created_by = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # C questions: resource budget measured from the reference solution
+    reference_solution = db.Column(db.Text)
+    reference_cpu_seconds = db.Column(db.Float)
+    reference_max_rss_kb = db.Column(db.Integer)
 
     answers = db.relationship('StudentAnswer', back_populates='question')
     evaluations = db.relationship('Evaluation', back_populates='question')
+    test_cases = db.relationship('CTestCase', back_populates='question', cascade='all, delete-orphan',
+                                 order_by='CTestCase.id')
 
 
 class Student(db.Model, UserMixin):
@@ -107,11 +113,77 @@ class Evaluation(db.Model):
     grammar_mistakes = db.Column(db.Float, nullable=True)
     word_count = db.Column(db.Float, nullable=True)
     predicted_marks = db.Column(db.Float, nullable=True)
+    marks_overridden = db.Column(db.Boolean, default=False)  # predicted_marks were set by an evaluator; regrading keeps them
+    keras_marks = db.Column(db.Float, nullable=True)  # Keras grader prediction, kept apart from the metric-based marks
     summary = db.Column(db.Text)
+    # Fingerprint of the grading inputs, used to skip re-evaluating unchanged answers
+    answer_hash = db.Column(db.String(64))
+    model_answer_hash = db.Column(db.String(64))
+    pipeline_version = db.Column(db.String(20))
+    model_versions = db.Column(db.String(255))
+    degraded = db.Column(db.Boolean, default=False)  # a stage fell back to a default value; regrade next time
 
     question = db.relationship('Questions', back_populates='evaluations')
 
 
+class GradingJob(db.Model):
+    __tablename__ = 'grading_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    force = db.Column(db.Boolean, default=False)  # recompute even if the evaluation is up to date
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class PaperGradingJob(db.Model):
+    __tablename__ = 'paper_grading_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    paper_id = db.Column(db.Integer, db.ForeignKey('question_paper.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    force = db.Column(db.Boolean, default=False)  # recompute evaluations that are up to date
+    report = db.Column(db.Text)  # JSON report from batch_grading.grade_paper
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class CTestCase(db.Model):
+    __tablename__ = 'c_test_cases'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False, index=True)
+    input_text = db.Column(db.Text, nullable=False, default='')  # fed to the program on stdin
+    expected_output = db.Column(db.Text, nullable=False)
+    weight = db.Column(db.Float, nullable=False, default=1.0)
+    is_hidden = db.Column(db.Boolean, default=False)  # input and expected output are not shown to students
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    question = db.relationship('Questions', back_populates='test_cases')
+
+
+class CRunJob(db.Model):
+    __tablename__ = 'c_run_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=True)  # graded on its test cases
+    source = db.Column(db.Text, nullable=False)
+    stdin_data = db.Column(db.LargeBinary)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    result = db.Column(db.Text)  # JSON: status, message, marks, test_results and profile for result.html
+    error = db.Column(db.Text)
+    # Resource usage of the run (worst case over test cases)
+    cpu_seconds = db.Column(db.Float)
+    max_rss_kb = db.Column(db.Integer)
+    wall_seconds = db.Column(db.Float)
+    output_bytes = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
 class QuestionPaper(db.Model):
     __tablename__ = 'question_paper'
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,157 @@
+"""
+Near-duplicate detection across students' answers to the same question.
+
+Every answer to a question is encoded once, through the shared embedding
+store so that repeated reports reuse the stored vectors, and stacked into a
+single normalized embedding matrix. All-pairs cosine similarity is then
+computed in blocks of matrix products, so memory stays bounded for large
+cohorts. When a cohort exceeds Config.PLAGIARISM_ANN_THRESHOLD and `faiss` is
+installed, an approximate nearest-neighbour index is used instead of the
+exact scan. Pairs above the similarity threshold are grouped into clusters
+with union-find.
+"""
+import csv
+import io
+import logging
+
+import numpy as np
+
+from config import Config
+from embedding_store import get_embeddings
+from model_registry import model_slot
+from models import db, StudentAnswer, Student
+
+
+def _exact_pairs(embeddings, threshold, block_size):
+    """Yield (i, j, similarity) with i < j for every pair at or above the threshold."""
+    n = len(embeddings)
+    for start in range(0, n, block_size):
+        block = embeddings[start:start + block_size]
+        # Only the upper triangle is needed, so compare against rows from `start` onwards
+        sims = block @ embeddings[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        for r, c in zip(rows, cols):
+            i, j = start + r, start + c
+            if i < j:
+                yield i, j, float(sims[r, c])
+
+
+def _approximate_pairs(embeddings, threshold, neighbours):
+    import faiss
+
+    index = faiss.IndexHNSWFlat(embeddings.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.add(embeddings)
+    sims, ids = index.search(embeddings, min(neighbours + 1, len(embeddings)))
+    for i in range(len(embeddings)):
+        for sim, j in zip(sims[i], ids[i]):
+            if j > i and sim >= threshold:
+                yield i, int(j), float(sim)
+
+
+def find_similar_pairs(embeddings, threshold, block_size=1024, neighbours=20):
+    """
+    Return (i, j, similarity) pairs for rows of a normalized embedding matrix
+    whose cosine similarity is at or above `threshold`.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if len(embeddings) > Config.PLAGIARISM_ANN_THRESHOLD:
+        try:
+            return list(_approximate_pairs(embeddings, threshold, neighbours))
+        except ImportError:
+            logging.info("faiss is not installed; using exact similarity search")
+    return list(_exact_pairs(embeddings, threshold, block_size))
+
+
+def similarity_range(embeddings, block_size=1024):
+    """Return the (lowest, highest) similarity over all pairs of rows of a normalized matrix."""
+    lowest, highest = 1.0, -1.0
+    n = len(embeddings)
+    for start in range(0, n, block_size):
+        sims = embeddings[start:start + block_size] @ embeddings[start:].T
+        # Keep only pairs (i, j) with i < j
+        upper = sims[np.triu_indices(len(sims), k=1, m=sims.shape[1])]
+        if upper.size:
+            lowest, highest = min(lowest, float(upper.min())), max(highest, float(upper.max()))
+    return lowest, highest
+
+
+def cluster_pairs(count, pairs):
+    """Group indices connected by pairs into clusters of two or more, largest first."""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+def find_near_duplicates(question_id, threshold=None, block_size=1024):
+    """
+    Return clusters of near-duplicate answers to a question. Each cluster is
+    a dict with its members (student and answer details) and the highest and
+    lowest pairwise similarity inside it, as percentages.
+    """
+    threshold = threshold if threshold is not None else Config.PLAGIARISM_THRESHOLD
+    rows = db.session.query(StudentAnswer, Student)\
+        .join(Student, StudentAnswer.student_id == Student.id)\
+        .filter(StudentAnswer.question_id == question_id)\
+        .order_by(StudentAnswer.id)\
+        .all()
+
+    # Compare only each student's latest answer
+    latest = {}
+    for answer, student in rows:
+        if answer.answer_text and answer.answer_text.strip():
+            latest[student.id] = (answer, student)
+    rows = list(latest.values())
+    if len(rows) < 2:
+        return []
+
+    with model_slot('sentence_model'):
+        embeddings = np.stack(get_embeddings([answer.answer_text for answer, _ in rows])).astype(np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    pairs = find_similar_pairs(embeddings, threshold / 100, block_size=block_size)
+
+    clusters = []
+    for members in cluster_pairs(len(rows), pairs):
+        # Members are linked through chains of similar pairs, so the lowest
+        # similarity has to come from every pair, not only the linking ones
+        lowest, highest = similarity_range(embeddings[members], block_size=block_size)
+        clusters.append({
+            'size': len(members),
+            'max_similarity': round(highest * 100, 2),
+            'min_similarity': round(lowest * 100, 2),
+            'members': [{
+                'student_id': rows[i][1].id,
+                'student_name': rows[i][1].name,
+                'registration_number': rows[i][1].student_id,
+                'answer_id': rows[i][0].id,
+                'answer_text': rows[i][0].answer_text,
+            } for i in members],
+        })
+    return clusters
+
+
+def clusters_to_csv(question_id, clusters):
+    """Render near-duplicate clusters as CSV, one row per clustered answer."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['question_id', 'cluster', 'cluster_size', 'max_similarity', 'min_similarity',
+                     'student_id', 'registration_number', 'student_name', 'answer_id', 'answer_text'])
+    for number, cluster in enumerate(clusters, start=1):
+        for member in cluster['members']:
+            writer.writerow([question_id, number, cluster['size'], cluster['max_similarity'],
+                             cluster['min_similarity'], member['student_id'], member['registration_number'],
+                             member['student_name'], member['answer_id'], member['answer_text']])
+    return output.getvalue()
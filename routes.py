@@ -1,11 +1,19 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify, Response
 from flask_login import login_user, logout_user, login_required, current_user
-from models import Student, db, Questions, StudentAnswer, Evaluation, QuestionPaper, QuestionPaperQuestion, Evaluator
-from utils import calculate_summary, save_evaluation_results, calculate_similarity, count_grammar_mistakes, word_count, load_model, load_dataset, load_tokenizer, evaluate_student_answers
-from utils import evaluate_errors, run_c_program, classify_errors, calculate_marks
+from models import Student, db, Questions, StudentAnswer, Evaluation, QuestionPaper, QuestionPaperQuestion, Evaluator, GradingJob, PaperGradingJob, CTestCase, CRunJob
+from utils import save_evaluation_results, calculate_similarity, count_grammar_mistakes, word_count, load_model, load_dataset, load_tokenizer
+from utils import evaluation_fingerprint, matches_fingerprint
+from utils import measure_reference_solution
+from model_registry import registry
+from embedding_store import get_model_answer_embedding
+from summary_cache import get_summary_cache
+from c_runner import get_c_runner
+from grading_queue import submit_grading_job, submit_paper_grading_job, job_to_dict, paper_job_to_dict
+from c_job_queue import submit_c_run_job, expire_if_stale, QueueFull, job_result as c_job_result, job_to_dict as c_job_to_dict
 import logging
 import os
-import subprocess
+from config import Config
+from instrumentation import render_prometheus
 
 main = Blueprint('main', __name__)
 
@@ -127,6 +135,7 @@ def submit_marks():
     evaluation = Evaluation.query.filter_by(student_id=student_id, question_id=question_id).first()
     if evaluation:
         evaluation.predicted_marks = marks
+        evaluation.marks_overridden = True
     else:
         new_evaluation = Evaluation(
             student_id=student_id,
@@ -149,7 +158,167 @@ def evaluator_dashboard():
         flash('Access denied. Evaluator privileges required.', 'error')
         return redirect(url_for('main.home'))
     students = Student.query.all()
-    return render_template('evaluator_dashboard.html', students=students)
+    question_papers = QuestionPaper.query.all()
+    return render_template('evaluator_dashboard.html', students=students, question_papers=question_papers)
+
+@main.route('/grade_paper/<int:paper_id>', methods=['POST'])
+@login_required
+def grade_paper(paper_id):
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+    paper = QuestionPaper.query.get_or_404(paper_id)
+
+    # A paper can hold thousands of answers, far more than one request may spend on the models
+    try:
+        job = submit_paper_grading_job(paper_id, force=bool(request.form.get('force')))
+    except Exception as e:
+        logging.error(f"Error queueing grading for paper {paper_id}: {e}")
+        flash('An error occurred while grading the paper.', 'error')
+        return redirect(url_for('main.evaluator_dashboard'))
+    return render_template('paper_grading_pending.html', paper=paper, job=job), 202
+
+@main.route('/paper_grading_jobs/<int:job_id>')
+@login_required
+def paper_grading_job_status(job_id):
+    if not isinstance(current_user, Evaluator):
+        return jsonify({'error': 'Evaluator privileges required'}), 403
+    return jsonify(paper_job_to_dict(PaperGradingJob.query.get_or_404(job_id)))
+
+@main.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@main.route('/ready')
+def ready():
+    # Models load lazily or on the warm-up thread; report whether grading will be fast yet
+    stats = registry.stats()
+    models = {name: model['loaded'] for name, model in stats['models'].items() if model['warm_up']}
+    return jsonify({'ready': stats['ready'], 'models': models}), 200 if stats['ready'] else 503
+
+@main.route('/metrics')
+def metrics():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@main.route('/model_stats')
+@login_required
+def model_stats():
+    if not isinstance(current_user, Evaluator):
+        return jsonify({'error': 'Evaluator privileges required'}), 403
+    stats = registry.stats()
+    stats['summary_cache'] = get_summary_cache().stats()
+    compile_cache = get_c_runner().cache
+    stats['compile_cache'] = compile_cache.stats() if compile_cache is not None else None
+    return jsonify(stats)
+
+@main.route('/summary_cache/purge', methods=['POST'])
+@login_required
+def purge_summary_cache():
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+    removed = get_summary_cache().purge()
+    flash(f'Summary cache purged ({removed} cached summaries removed).', 'success')
+    return redirect(url_for('main.evaluator_dashboard'))
+
+@main.route('/plagiarism')
+@main.route('/plagiarism/<int:question_id>')
+@login_required
+def plagiarism_report(question_id=None):
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+
+    questions = Questions.query.all()
+    question_id = question_id if question_id is not None else request.args.get('question_id', type=int)
+    question = Questions.query.get_or_404(question_id) if question_id is not None else None
+    threshold = request.args.get('threshold', Config.PLAGIARISM_THRESHOLD, type=float)
+
+    clusters = []
+    if question:
+        from plagiarism import find_near_duplicates
+        clusters = find_near_duplicates(question.id, threshold=threshold)
+
+    return render_template('plagiarism.html', questions=questions, question=question,
+                           clusters=clusters, threshold=threshold)
+
+@main.route('/plagiarism/<int:question_id>/report.csv')
+@login_required
+def plagiarism_report_csv(question_id):
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+    Questions.query.get_or_404(question_id)
+    threshold = request.args.get('threshold', Config.PLAGIARISM_THRESHOLD, type=float)
+
+    from plagiarism import find_near_duplicates, clusters_to_csv
+    clusters = find_near_duplicates(question_id, threshold=threshold)
+    return Response(clusters_to_csv(question_id, clusters), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename=plagiarism_question_{question_id}.csv'})
+
+@main.route('/c_test_cases', methods=['GET', 'POST'])
+@main.route('/c_test_cases/<int:question_id>', methods=['GET', 'POST'])
+@login_required
+def c_test_cases(question_id=None):
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+
+    questions = Questions.query.all()
+    question_id = question_id if question_id is not None else request.args.get('question_id', type=int)
+    question = Questions.query.get_or_404(question_id) if question_id is not None else None
+
+    if request.method == 'POST' and question is not None and request.form.get('action') == 'reference':
+        source = request.form.get('reference_solution', '')
+        if not source.strip():
+            question.reference_solution = None
+            question.reference_cpu_seconds = question.reference_max_rss_kb = None
+            db.session.commit()
+            flash('Reference solution cleared.', 'success')
+            return redirect(url_for('main.c_test_cases', question_id=question.id))
+        try:
+            profile = measure_reference_solution(source, question.test_cases)
+        except ValueError as e:
+            flash(str(e), 'error')
+        else:
+            question.reference_solution = source
+            question.reference_cpu_seconds = profile['cpu_seconds']
+            question.reference_max_rss_kb = profile['max_rss_kb']
+            db.session.commit()
+            flash(f"Reference solution measured: {profile['cpu_seconds']:.3f}s CPU, "
+                  f"{profile['max_rss_kb'] or '?'} KB peak memory.", 'success')
+        return redirect(url_for('main.c_test_cases', question_id=question.id))
+
+    if request.method == 'POST' and question is not None:
+        expected_output = request.form.get('expected_output', '')
+        if not expected_output.strip():
+            flash('Expected output is required.', 'error')
+        else:
+            db.session.add(CTestCase(
+                question_id=question.id,
+                input_text=request.form.get('input_text', ''),
+                expected_output=expected_output,
+                weight=request.form.get('weight', 1.0, type=float),
+                is_hidden=bool(request.form.get('is_hidden')),
+            ))
+            db.session.commit()
+            flash('Test case added successfully!', 'success')
+        return redirect(url_for('main.c_test_cases', question_id=question.id))
+
+    return render_template('c_test_cases.html', questions=questions, question=question)
+
+@main.route('/c_test_cases/delete/<int:test_case_id>', methods=['POST'])
+@login_required
+def delete_c_test_case(test_case_id):
+    if not isinstance(current_user, Evaluator):
+        flash('Access denied. Evaluator privileges required.', 'error')
+        return redirect(url_for('main.home'))
+    test_case = CTestCase.query.get_or_404(test_case_id)
+    question_id = test_case.question_id
+    db.session.delete(test_case)
+    db.session.commit()
+    flash('Test case deleted.', 'success')
+    return redirect(url_for('main.c_test_cases', question_id=question_id))
 
 @main.route('/view_evaluation/<int:student_id>/<int:question_id>')
 @login_required
@@ -216,6 +385,13 @@ def add_question():
         new_question = Questions(question_text=question_text, model_answer=model_answer, created_by=evaluator_id)
         db.session.add(new_question)
         db.session.commit()
+
+        # Cache the model answer embedding now so grading never has to encode it
+        try:
+            get_model_answer_embedding(model_answer)
+        except Exception as e:
+            logging.error(f"Error caching model answer embedding for question {new_question.id}: {e}")
+
         flash('Question added successfully!', 'success')
         return redirect(url_for('main.add_question'))
     
@@ -398,92 +574,44 @@ def view_results(student_id):
                             total_marks=total_marks, 
                             final_score=final_score[0])
 
-# Load model and tokenizer once at the start
-model = load_model()
-tokenizer = load_tokenizer()
-ds = load_dataset()  # Only if ds doesn't change between requests
-from flask import flash
-max_seq_length=100
-from tf_keras.preprocessing.sequence import pad_sequences
 @main.route('/view_metrics/<int:student_id>/<int:question_id>', methods=['GET', 'POST'])
 
 def view_metrics(student_id, question_id):
-    answer_record = StudentAnswer.query.filter_by(student_id=student_id, question_id=question_id).first()
+    # Grading always uses the latest submission, so the fingerprint check must too
+    answer_record = StudentAnswer.query.filter_by(student_id=student_id, question_id=question_id)\
+        .order_by(StudentAnswer.id.desc()).first()
     question_record = Questions.query.filter_by(id=question_id).first()
 
     if not answer_record or not question_record:
         return "Answer or question not found", 404
 
-    student_answer = answer_record.answer_text
-    model_answer = question_record.model_answer
-
-    try:
-        # Fetch the existing evaluation record or create a new one if it doesn't exist
-        evaluation_record = Evaluation.query.filter_by(student_id=student_id, question_id=question_id).first()
+    # Return the stored evaluation if it was graded from these inputs; grading itself runs in the background.
+    # A degraded evaluation is shown too, with a retry link, rather than queueing a new job on every visit
+    evaluation_record = Evaluation.query.filter_by(student_id=student_id, question_id=question_id).first()
+    logging.debug(f"Evaluation Record: {evaluation_record}")
 
-        # Log if the record is found or not
-        logging.debug(f"Evaluation Record: {evaluation_record}")
-
-        # Compute evaluation metrics
-        summary_result = calculate_summary(student_answer)
-        similarity_result = calculate_similarity(model_answer, student_answer)
-        grammar_mistakes = count_grammar_mistakes(student_answer)
-        word_count_result = word_count(student_answer)
-
-        # Ensure similarity_result and word_count_result are valid numbers
-        if not isinstance(similarity_result, (int, float)):
-            raise ValueError("Similarity result is not a valid number")
-        
-        if not isinstance(word_count_result, int):
-            raise ValueError("Word count result is not a valid integer")
-
-        # Apply the thresholds for predicted marks
-        predicted_marks = max(0, min(10, (similarity_result * 0.5 + word_count_result * 0.3 + (100 - grammar_mistakes) * 0.2)))
-
-        if similarity_result <= 35:
-            predicted_marks = 0
-        if word_count_result <= 6:
-            predicted_marks = 0
-
-        # If no evaluation record, create one
-        if not evaluation_record:
-            evaluation_record = Evaluation(
-                student_id=student_id,
-                question_id=question_id,
-                similarity=similarity_result,
-                grammar_mistakes=grammar_mistakes,
-                word_count=word_count_result,
-                summary=summary_result,
-                predicted_marks=predicted_marks
-            )
-            db.session.add(evaluation_record)
-            flash('Evaluation created successfully!', 'success')
-        else:
-            # Update existing evaluation record
-            evaluation_record.similarity = similarity_result
-            evaluation_record.grammar_mistakes = grammar_mistakes
-            evaluation_record.word_count = word_count_result
-            evaluation_record.summary = summary_result
-            evaluation_record.predicted_marks = predicted_marks
-            flash('Evaluation updated successfully!', 'success')
-
-        db.session.commit()
-
-    except Exception as e:
-        logging.error(f"Error during evaluations: {e}")
-        return "An error occurred during evaluation.", 500
-
-    # Handle POST request to update marks
+    # Manual marks are saved before the staleness check, so a pending regrade cannot drop them
     if request.method == 'POST':
-        new_marks = request.form.get('marks', type=int)
-
-        # Update marks in the database
-        evaluation_record.predicted_marks = new_marks
-        db.session.commit()
-        flash('Marks updated successfully!', 'success')
+        new_marks = request.form.get('marks', type=float)
+        if evaluation_record is None or new_marks is None:
+            flash('Marks could not be saved: this answer has not been evaluated yet.'
+                  if new_marks is not None else 'Marks could not be saved: enter a number.', 'error')
+        else:
+            evaluation_record.predicted_marks = new_marks
+            evaluation_record.marks_overridden = True
+            db.session.commit()
+            logging.debug(f"Updated Evaluation Record: {evaluation_record.predicted_marks}")
+            flash('Marks updated successfully!', 'success')
 
-    # Log after committing the session to verify update
-    logging.debug(f"Updated Evaluation Record: {evaluation_record.predicted_marks}")
+    force = bool(request.args.get('regrade'))
+    fingerprint = evaluation_fingerprint(answer_record.answer_text, question_record.model_answer)
+    if force or not matches_fingerprint(evaluation_record, fingerprint):
+        try:
+            job = submit_grading_job(student_id, question_id, force=force)
+        except Exception as e:
+            logging.error(f"Error queueing evaluation: {e}")
+            return "An error occurred during evaluation.", 500
+        return render_template('grading_pending.html', answer=answer_record, job=job), 202
 
     # Prepare evaluation data for display
     evaluation = {
@@ -491,12 +619,23 @@ def view_metrics(student_id, question_id):
         "grammar_mistakes": evaluation_record.grammar_mistakes,
         "word_count": evaluation_record.word_count,
         "summary": evaluation_record.summary,
-        "predicted_marks": evaluation_record.predicted_marks
+        "predicted_marks": evaluation_record.predicted_marks,
+        "keras_marks": evaluation_record.keras_marks,
+        "degraded": evaluation_record.degraded,
+        "marks_overridden": evaluation_record.marks_overridden
     }
 
     # Return the evaluation data to the frontend
     return render_template('after.html', answer=answer_record, evaluation=evaluation)
 
+@main.route('/grading_jobs/<int:job_id>')
+def grading_job_status(job_id):
+    job = GradingJob.query.get_or_404(job_id)
+    status = job_to_dict(job)
+    if job.status == 'done':
+        status['result_url'] = url_for('main.view_metrics', student_id=job.student_id, question_id=job.question_id)
+    return jsonify(status)
+
 @main.route('/view_exam_results/<int:student_id>/<int:paper_id>')
 def view_exam_results(student_id, paper_id):
     # Fetch the student and question paper details
@@ -553,50 +692,69 @@ def view_exam_results(student_id, paper_id):
         total_marks=total_marks
     )
 
+def _questions_with_test_cases():
+    return Questions.query.join(CTestCase).distinct().all()
+
 @main.route('/up')
 def up():
-    return render_template('upload.html')
-SAVE_DIR = 'C:/workspaces/error_log/test'
-
-# Ensure the directory exists
-os.makedirs(SAVE_DIR, exist_ok=True)
-
+    return render_template('upload.html', questions=_questions_with_test_cases())
 @main.route('/upload', methods=['POST'])
 def upload():
     c_code = request.form.get('c_code')
     input_file = request.files.get('input_file')
 
+    question_id = request.form.get('question_id', type=int)
+
+    if not c_code:
+        flash('Please enter a C program to run.', 'error')
+        return render_template('upload.html', questions=_questions_with_test_cases())
+
     # Validate C code for security
-    if c_code:
-        from utils import validate_c_code, sanitize_input
-        
-        # Sanitize the input
-        c_code = sanitize_input(c_code)
-        
-        # Validate for security
-        is_valid, validation_message = validate_c_code(c_code)
-        if not is_valid:
-            flash(f'Code validation failed: {validation_message}', 'error')
-            return render_template('upload.html')
-
-    # Paths for saving the files
-    code_file_path = 'C:/workspaces/error_log/test/code.c'
-    input_file_path = 'C:/workspaces/error_log/test/input.txt'
-
-    # Save the C code to a file
-    if c_code:
-        with open(code_file_path, 'w', encoding='utf-8') as code_file:
-            code_file.write(c_code)
-
-    # Save the uploaded input file
-    if input_file:
-        input_file.save(input_file_path)
-
-    # Compile and run the C program
-    status, message = run_c_program(code_file_path)
-
-    if status in ['Compilation Error', 'Runtime Error']:
-        marks = calculate_marks(message)
-        return render_template('result.html', status=status, message=message, marks=marks)
-    else:
-        return render_template('result.html', status=status, message=message, marks=10)
+    from utils import validate_c_code, sanitize_input
+
+    # Sanitize the input
+    c_code = sanitize_input(c_code)
+
+    # Validate for security
+    is_valid, validation_message = validate_c_code(c_code)
+    if not is_valid:
+        flash(f'Code validation failed: {validation_message}', 'error')
+        return render_template('upload.html', questions=_questions_with_test_cases())
+
+    if question_id:
+        Questions.query.get_or_404(question_id)
+
+    # The uploaded input file is fed to the program on stdin
+    stdin_data = input_file.read() if input_file else None
+
+    # Compile and run in the background so an endless loop never holds this worker
+    try:
+        job = submit_c_run_job(c_code, stdin_data, question_id)
+    except QueueFull as e:
+        flash(f'The grader is busy right now ({e}). Please try again in a minute.', 'error')
+        return render_template('upload.html', questions=_questions_with_test_cases()), 503
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job.id, 'status_url': url_for('main.c_run_job_status', job_id=job.id),
+                        'result_url': url_for('main.c_run_job_result', job_id=job.id)}), 202
+    return redirect(url_for('main.c_run_job_result', job_id=job.id))
+
+@main.route('/c_jobs/<int:job_id>')
+def c_run_job_status(job_id):
+    job = expire_if_stale(CRunJob.query.get_or_404(job_id))
+    status = c_job_to_dict(job)
+    if job.status == 'done':
+        status['result'] = c_job_result(job)
+        status['result_url'] = url_for('main.c_run_job_result', job_id=job.id)
+    return jsonify(status)
+
+@main.route('/c_jobs/<int:job_id>/result')
+def c_run_job_result(job_id):
+    job = expire_if_stale(CRunJob.query.get_or_404(job_id))
+    if job.status != 'done':
+        return render_template('c_job_pending.html', job=job), 202
+    result = c_job_result(job)
+    question = db.session.get(Questions, job.question_id) if job.question_id else None
+    return render_template('result.html', status=result['status'], message=result['message'],
+                           marks=result['marks'], test_results=result['test_results'], question=question,
+                           profile=result.get('profile'), performance=result.get('performance'))
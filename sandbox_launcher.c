@@ -0,0 +1,89 @@
+/*
+ * Runs a student program under resource limits and reports its resource usage.
+ *
+ * c_runner.py compiles this once and starts every student program through it.
+ * The program is forked from this small process rather than from the Python
+ * server, because Linux carries a process's peak RSS over fork and exec, and
+ * a child of the server would report the server's memory as its own.
+ *
+ * usage: sandbox_launcher REPORT CPU_SECONDS MEMORY_BYTES FILE_BYTES WALL_SECONDS PROGRAM
+ *
+ * REPORT receives one line: "exit_code signal timed_out user_seconds system_seconds max_rss_kb".
+ */
+#include <errno.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+static pid_t child;
+static volatile sig_atomic_t timed_out;
+
+static void on_alarm(int sig)
+{
+    (void)sig;
+    timed_out = 1;
+    kill(child, SIGKILL);
+}
+
+static void limit(int resource, rlim_t soft, rlim_t hard)
+{
+    struct rlimit rl = { soft, hard };
+    setrlimit(resource, &rl);
+}
+
+int main(int argc, char **argv)
+{
+    if (argc < 7) {
+        fprintf(stderr, "usage: %s REPORT CPU_SECONDS MEMORY_BYTES FILE_BYTES WALL_SECONDS PROGRAM\n", argv[0]);
+        return 2;
+    }
+    rlim_t cpu = strtoull(argv[2], NULL, 10);
+    rlim_t memory = strtoull(argv[3], NULL, 10);
+    rlim_t file_size = strtoull(argv[4], NULL, 10);
+    unsigned int wall = (unsigned int)strtoul(argv[5], NULL, 10);
+
+    child = fork();
+    if (child < 0) {
+        perror("fork");
+        return 2;
+    }
+    if (child == 0) {
+        limit(RLIMIT_CPU, cpu, cpu + 1);
+        limit(RLIMIT_AS, memory, memory);
+        limit(RLIMIT_FSIZE, file_size, file_size);
+        limit(RLIMIT_CORE, 0, 0);
+        execv(argv[6], argv + 6);
+        _exit(127);
+    }
+
+    signal(SIGALRM, on_alarm);
+    alarm(wall);
+
+    int status;
+    struct rusage usage;
+    while (wait4(child, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            perror("wait4");
+            return 2;
+        }
+    }
+
+    FILE *report = fopen(argv[1], "w");
+    if (report == NULL) {
+        perror("fopen");
+        return 2;
+    }
+    fprintf(report, "%d %d %d %ld.%06ld %ld.%06ld %ld\n",
+            WIFEXITED(status) ? WEXITSTATUS(status) : 0,
+            WIFSIGNALED(status) ? WTERMSIG(status) : 0,
+            (int)timed_out,
+            (long)usage.ru_utime.tv_sec, (long)usage.ru_utime.tv_usec,
+            (long)usage.ru_stime.tv_sec, (long)usage.ru_stime.tv_usec,
+            usage.ru_maxrss);
+    fclose(report);
+    return 0;
+}
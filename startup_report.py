@@ -0,0 +1,65 @@
+"""
+Startup-time report for the Flask app.
+
+Imports `app` in a fresh interpreter with `python -X importtime`, prints the
+slowest imports by cumulative time and fails when the total exceeds
+Config.STARTUP_BUDGET_SECONDS. Model warm-up is disabled for the measurement
+since it runs on a background thread and does not delay serving requests.
+
+Usage: python startup_report.py [--top 25] [--module app]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from config import Config
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure_imports(module):
+    """Return (wall seconds, [(cumulative us, self us, depth, module name)])."""
+    env = dict(os.environ, MODEL_WARMUP='false')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, text=True)
+    wall_seconds = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+    return wall_seconds, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report how long the app takes to import.')
+    parser.add_argument('--module', default='app', help='Module to import (default: app)')
+    parser.add_argument('--top', type=int, default=25, help='Number of slowest imports to list')
+    args = parser.parse_args()
+
+    wall_seconds, imports = measure_imports(args.module)
+    top_level = [entry for entry in imports if entry[2] == 0]
+    import_seconds = sum(entry[0] for entry in top_level) / 1e6
+
+    print(f"Import of '{args.module}': {import_seconds:.3f}s in imports, {wall_seconds:.3f}s wall "
+          f"(budget {Config.STARTUP_BUDGET_SECONDS:.3f}s)")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, depth, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {'  ' * depth}{name}")
+
+    if wall_seconds > Config.STARTUP_BUDGET_SECONDS:
+        print(f"Startup budget exceeded by {wall_seconds - Config.STARTUP_BUDGET_SECONDS:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
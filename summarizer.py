@@ -0,0 +1,88 @@
+"""
+Summarizer backends for CPU grading boxes.
+
+The summarizer used by `calculate_summary` is chosen through Config:
+
+- SUMMARIZER_MODEL: any Hugging Face seq2seq checkpoint (t5-large, t5-small,
+  a distilled T5, ...)
+- SUMMARIZER_BACKEND: 'torch' (eager PyTorch), 'quantized' (PyTorch with
+  dynamic int8 quantization of the Linear layers) or 'onnx' (ONNX Runtime
+  export through the optional `optimum[onnxruntime]` package)
+- SUMMARIZER_NUM_BEAMS: 4 reproduces the original beam search, 1 switches to
+  greedy decoding
+
+Run `python summarizer_report.py` to compare modes on the bundled dataset.
+"""
+import logging
+
+BACKENDS = ('torch', 'quantized', 'onnx')
+
+
+class Summarizer:
+    def __init__(self, model, tokenizer, model_name, backend, num_beams=4):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.backend = backend
+        self.num_beams = num_beams
+
+    @property
+    def version(self):
+        return f"{self.model_name}:{self.backend}:beams={self.num_beams}"
+
+    def token_lengths(self, texts):
+        """Number of input tokens each text will occupy after truncation."""
+        encoded = self.tokenizer(["summarize: " + (text or "") for text in texts], max_length=512, truncation=True)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def generate(self, texts, max_length=150, min_length=50, length_penalty=2.0):
+        """Summarize a batch of texts; the batch is padded to its longest input."""
+        inputs = self.tokenizer(["summarize: " + (text or "") for text in texts],
+                                return_tensors='pt', max_length=512, truncation=True, padding=True)
+        options = {
+            'max_length': max_length,
+            'min_length': min_length,
+            'no_repeat_ngram_size': 2,
+        }
+        if self.num_beams > 1:
+            options.update(num_beams=self.num_beams, length_penalty=length_penalty, early_stopping=True)
+
+        summary_ids = self.model.generate(inputs['input_ids'], attention_mask=inputs['attention_mask'], **options)
+        return self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
+
+def load_summarizer(model_name, backend='torch', num_beams=4, threads=0):
+    """Build a Summarizer for the given checkpoint and backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown summarizer backend '{backend}', expected one of {BACKENDS}")
+
+    import torch
+    from transformers import AutoTokenizer
+
+    if threads:
+        torch.set_num_threads(threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == 'onnx':
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise RuntimeError("The 'onnx' summarizer backend requires: pip install optimum[onnxruntime]")
+
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, session_options=session_options)
+    else:
+        from transformers import AutoModelForSeq2SeqLM
+
+        # Load weights straight into the model (no throwaway random init) and
+        # prefer safetensors, which are read through mmap
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, low_cpu_mem_usage=True)
+        model.eval()
+        if backend == 'quantized':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    logging.info(f"Summarizer ready: {model_name} ({backend}, num_beams={num_beams})")
+    return Summarizer(model, tokenizer, model_name, backend, num_beams)
@@ -0,0 +1,108 @@
+"""
+Quality/latency report for the summarizer backends.
+
+Summarizes the student answers from the bundled evaluation dataset with each
+requested mode and reports load time, per-answer latency and ROUGE-L F1
+against the first (reference) mode, so a deployment can pick the cheapest
+mode whose summaries are still close enough.
+
+Usage:
+    python summarizer_report.py --limit 50 \
+        --modes t5-large:torch:4,t5-small:torch:1,t5-small:quantized:1,t5-small:onnx:1 \
+        --output summarizer_report.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from summarizer import load_summarizer
+from utils import load_dataset
+
+DEFAULT_MODES = 't5-large:torch:4,t5-large:quantized:4,t5-small:torch:4,t5-small:torch:1,t5-small:quantized:1'
+
+
+def rouge_l_f1(candidate, reference):
+    """ROUGE-L F1 over lower-cased whitespace tokens."""
+    a, b = candidate.lower().split(), reference.lower().split()
+    if not a or not b:
+        return 0.0
+
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(a), lcs / len(b)
+    return 2 * precision * recall / (precision + recall)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mode(spec):
+    model_name, backend, num_beams = spec.split(':')
+    return model_name, backend, int(num_beams)
+
+
+def run_mode(spec, texts, threads):
+    model_name, backend, num_beams = parse_mode(spec)
+    start = time.perf_counter()
+    summarizer = load_summarizer(model_name, backend, num_beams=num_beams, threads=threads)
+    load_seconds = time.perf_counter() - start
+
+    summaries, latencies = [], []
+    for text in texts:
+        start = time.perf_counter()
+        summaries.append(summarizer.generate([text])[0])
+        latencies.append(time.perf_counter() - start)
+
+    return summaries, {
+        'mode': spec,
+        'load_seconds': round(load_seconds, 3),
+        'p50_seconds': round(percentile(latencies, 50), 4),
+        'p95_seconds': round(percentile(latencies, 95), 4),
+        'mean_seconds': round(statistics.mean(latencies), 4),
+        'answers_per_second': round(len(texts) / sum(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare summarizer backends on the evaluation dataset.')
+    parser.add_argument('--dataset', default='student_evaluation_results (2).csv')
+    parser.add_argument('--modes', default=DEFAULT_MODES,
+                        help='Comma-separated model:backend:num_beams specs; the first is the quality reference')
+    parser.add_argument('--limit', type=int, default=50, help='Number of distinct answers to summarize')
+    parser.add_argument('--threads', type=int, default=0, help='Intra-op threads (0 = library default)')
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    df = load_dataset(args.dataset)
+    texts = list(dict.fromkeys(df['Student_Answer'].dropna().astype(str)))[:args.limit]
+
+    reference = None
+    report = []
+    for spec in args.modes.split(','):
+        summaries, result = run_mode(spec.strip(), texts, args.threads)
+        if reference is None:
+            reference = summaries
+        result['rouge_l_vs_reference'] = round(statistics.mean(
+            rouge_l_f1(candidate, ref) for candidate, ref in zip(summaries, reference)), 4)
+        report.append(result)
+        print(f"{result['mode']:<28} load {result['load_seconds']:>7.2f}s  p50 {result['p50_seconds']:>7.3f}s  "
+              f"p95 {result['p95_seconds']:>7.3f}s  {result['answers_per_second']:>7.2f} ans/s  "
+              f"ROUGE-L {result['rouge_l_vs_reference']:.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'answers': len(texts), 'reference': report[0]['mode'], 'modes': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
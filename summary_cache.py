@@ -0,0 +1,165 @@
+"""
+Two-level cache for generated summaries.
+
+Summaries are deterministic for a given text, summarizer and generation
+settings, so they are keyed by a SHA-256 of all three. A bounded in-memory
+LRU sits in front of a SQLite file that survives restarts and is shared by
+every worker process. `purge` bumps a generation number stored next to the
+summaries; each process checks it before trusting its memory tier, so a
+purge empties every worker's LRU, not only the one that ran it. Hits and misses are counted per tier and exported on
+`/metrics` as `summary_cache_lookups_total`.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import Config
+from instrumentation import counter
+
+CACHE_LOOKUPS = counter('summary_cache_lookups_total', 'Summary cache lookups by result')
+# Keys per SELECT; older SQLite builds allow at most 999 bound variables per statement
+QUERY_CHUNK = 500
+
+
+def summary_key(text, summarizer_version, **options):
+    payload = json.dumps({'text': text or "", 'summarizer': summarizer_version, 'options': options},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, path, max_entries=2048):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS summaries '
+                         '(key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL DEFAULT (julianday(\'now\')))')
+            conn.execute('CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0)')
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the cache safe to use from
+        # request threads and grading workers alike
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key, summary):
+        with self._lock:
+            self._memory[key] = summary
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _sync_generation(self, conn):
+        # Another process purged the cache: our memory tier may hold dropped summaries
+        generation = conn.execute('SELECT value FROM generation WHERE id = 0').fetchone()[0]
+        with self._lock:
+            if generation != self._generation:
+                self._memory.clear()
+                self._generation = generation
+
+    def get_many(self, keys):
+        """Return {key: summary} for the keys that are cached in either tier."""
+        found, rows = {}, []
+        try:
+            with self._connect() as conn:
+                self._sync_generation(conn)
+                with self._lock:
+                    for key in keys:
+                        if key in self._memory:
+                            self._memory.move_to_end(key)
+                            found[key] = self._memory[key]
+                unfound = [key for key in dict.fromkeys(keys) if key not in found]
+                for start in range(0, len(unfound), QUERY_CHUNK):
+                    chunk = unfound[start:start + QUERY_CHUNK]
+                    placeholders = ','.join('?' * len(chunk))
+                    rows += conn.execute(f'SELECT key, summary FROM summaries WHERE key IN ({placeholders})',
+                                         chunk).fetchall()
+        except sqlite3.Error as e:
+            # Without the generation the memory tier cannot be trusted either
+            logging.warning(f"Summary cache read failed: {e}")
+            found, rows = {}, []
+        self.memory_hits += len(found)
+        CACHE_LOOKUPS.inc(len(found), result='memory_hit')
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        for key, summary in rows:
+            found[key] = summary
+            self._remember(key, summary)
+        self.disk_hits += len(rows)
+        self.misses += len(missing) - len(rows)
+        CACHE_LOOKUPS.inc(len(rows), result='disk_hit')
+        CACHE_LOOKUPS.inc(len(missing) - len(rows), result='miss')
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store {key: summary} in both tiers."""
+        for key, summary in items.items():
+            self._remember(key, summary)
+        try:
+            with self._connect() as conn:
+                conn.executemany('INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)', items.items())
+        except sqlite3.Error as e:
+            logging.warning(f"Summary cache write failed: {e}")
+
+    def put(self, key, summary):
+        self.put_many({key: summary})
+
+    def purge(self):
+        """
+        Drop every cached summary from disk and from the memory tier of every
+        process using this file; returns the number removed from disk.
+        """
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM summaries').rowcount
+            conn.execute('UPDATE generation SET value = value + 1 WHERE id = 0')
+            self._sync_generation(conn)
+        with self._connect() as conn:
+            conn.execute('VACUUM')
+        logging.info(f"Purged {removed} cached summaries")
+        return removed
+
+    def stats(self):
+        try:
+            with self._connect() as conn:
+                disk_entries = conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+        except sqlite3.Error:
+            disk_entries = None
+        return {'entries_in_memory': len(self._memory), 'entries_on_disk': disk_entries,
+                'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """Return the process-wide summary cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SummaryCache(Config.SUMMARY_CACHE_PATH, Config.SUMMARY_CACHE_SIZE)
+    return _cache
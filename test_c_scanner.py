@@ -0,0 +1,121 @@
+"""Tests for the C submission security scanner."""
+import pytest
+
+from c_scanner import CScanner
+
+DENY_IDENTIFIERS = ('system', 'exit', 'fork', 'signal')
+DENY_INCLUDES = ('windows.h', 'sys/socket.h')
+
+
+@pytest.fixture
+def scanner():
+    return CScanner(DENY_IDENTIFIERS, deny_includes=DENY_INCLUDES, max_fopen=2)
+
+
+def names(findings):
+    return [(finding.kind, finding.name) for finding in findings]
+
+
+def test_clean_program(scanner):
+    source = '#include <stdio.h>\nint main(void) {\n    printf("hi\\n");\n    return 0;\n}\n'
+    assert scanner.scan(source) == []
+
+
+def test_denied_identifier_with_line(scanner):
+    findings = scanner.scan('int main(void) {\n    system("ls");\n}\n')
+    assert names(findings) == [('function', 'system')]
+    assert findings[0].line == 2
+
+
+def test_identifier_must_match_whole_token(scanner):
+    assert scanner.scan('int exited = 0; int my_system(void); int systemd;') == []
+
+
+@pytest.mark.parametrize('source', [
+    '// system("rm -rf /");\nint main(void) { return 0; }',
+    '/* exit(1);\n   fork(); */\nint main(void) { return 0; }',
+    'int main(void) { puts("call system() and exit"); return 0; }',
+    "int main(void) { char c = '\\''; return c; }",
+    'int main(void) { puts("escaped \\" quote, then exit"); return 0; }',
+])
+def test_comments_and_literals_are_skipped(scanner, source):
+    assert scanner.scan(source) == []
+
+
+@pytest.mark.parametrize('source', [
+    '#include <windows.h>',
+    '  #  include <windows.h>',
+    '#include "windows.h"',
+    '/* x */ #include <windows.h>',
+    '/* a\n   b */ #include <windows.h>',
+    '# /* x */ include <windows.h>',
+    '#include /* x */ <windows.h>',
+    '#inc\\\nlude <windows.h>',
+    '%:include <windows.h>',
+    '??=include <windows.h>',
+    '#include_next <windows.h>',
+    '#import <windows.h>',
+    '#include <./windows.h>',
+    '#include <sys//socket.h>',
+])
+def test_denied_includes(scanner, source):
+    findings = scanner.scan(source)
+    assert [finding.kind for finding in findings] == ['include']
+
+
+@pytest.mark.parametrize('source', [
+    'puts("#include <windows.h>");',
+    '// #include <windows.h>',
+    'int x; #include <windows.h>',
+])
+def test_include_outside_a_directive_is_ignored(scanner, source):
+    assert scanner.scan(source) == []
+
+
+def test_include_does_not_report_header_name_as_identifier(scanner):
+    assert scanner.scan('#include <signal.h>\n') == []
+
+
+def test_macro_include_is_reported(scanner):
+    findings = scanner.scan('#define HEADER <windows.h>\n#include HEADER\n')
+    assert names(findings) == [('include', 'include')]
+    assert findings[0].line == 2
+
+
+def test_allow_includes_rejects_other_headers():
+    scanner = CScanner(allow_includes=('stdio.h', 'stdlib.h'))
+    source = '#include <stdio.h>\n#include <stdlib.h>\n#include <unistd.h>\n'
+    findings = scanner.scan(source)
+    assert names(findings) == [('include', 'unistd.h')]
+    assert findings[0].line == 3
+
+
+def test_allow_identifiers_override_deny():
+    scanner = CScanner(deny_identifiers=('exit',), allow_identifiers=('exit',))
+    assert scanner.scan('int main(void) { exit(0); }') == []
+
+
+def test_line_numbers_after_comments_and_splices(scanner):
+    source = ('/* one\n'
+              '   two */\n'
+              '#define LONG_MACRO \\\n'
+              '    1\n'
+              'int main(void) {\n'
+              '    exit(0);\n'
+              '}\n')
+    assert [finding.line for finding in scanner.scan(source)] == [6]
+
+
+def test_fopen_limit_reported_once(scanner):
+    source = ''.join(f'FILE *f{i} = fopen("f{i}", "r");\n' for i in range(5))
+    findings = scanner.scan(source)
+    assert names(findings) == [('limit', 'fopen')]
+    assert findings[0].line == 3
+
+
+def test_fopen_within_limit(scanner):
+    assert scanner.scan('fopen("a", "r");\nfopen("b", "r");\n') == []
+
+
+def test_scan_many(scanner):
+    assert [len(findings) for findings in scanner.scan_many(['exit(0);', 'int x;'])] == [1, 0]
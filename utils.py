@@ -1,50 +1,33 @@
-import subprocess
 import logging
 import re
 import os
-from collections import Counter
-from nltk.tokenize import sent_tokenize
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-import language_tool_python
-import pandas as pd
 import pickle
-import nltk
-import spacy
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from transformers import pipeline
+import numpy as np
 from models import StudentAnswer, Questions, db ,Evaluation
+from model_registry import get_summarizer, get_sentence_model, get_grammar_service, get_grader, model_slot
+from embedding_store import get_model_answer_embedding, get_model_answer_embeddings, text_hash
+from config import Config
+from instrumentation import timed_stage
+from batching import run_bucketed
+from summary_cache import get_summary_cache, summary_key
+from c_runner import get_c_runner, runtime_error_log
+from c_scanner import get_c_scanner
+from c_diagnostics import Diagnostic, parse_output as parse_diagnostics, summarize as summarize_diagnostics
 
 # Security function for validating C code
 def validate_c_code(code):
     """
     Validate C code for security issues before compilation
     """
-    dangerous_functions = [
-        'system', 'exec', 'popen', 'fork', 'exit',
-        'remove', 'unlink', 'rmdir', 'chmod'
-    ]
-    
-    dangerous_includes = [
-        'windows.h', 'sys/socket.h', 'netinet/in.h'
-    ]
-    
-    # Check for dangerous functions
-    for func in dangerous_functions:
-        if func in code:
-            return False, f"Dangerous function '{func}' detected"
-    
-    # Check for dangerous includes
-    for include in dangerous_includes:
-        if include in code:
-            return False, f"Potentially dangerous include '{include}' detected"
-    
-    # Check for excessive file operations
-    if code.count('fopen') > 3:
-        return False, "Too many file operations detected"
-    
+    findings = get_c_scanner().scan(code)
+    if findings:
+        return False, findings[0].message
     return True, "Code validation passed"
 
+def scan_c_sources(sources):
+    """Security-scan a batch of C sources; returns one list of c_scanner.Finding per source."""
+    return get_c_scanner().scan_many(sources)
+
 # Input sanitization function
 def sanitize_input(text, max_length=10000):
     """
@@ -73,12 +56,47 @@ def sanitize_input(text, max_length=10000):
     
     return text.strip()
        
-sentence_model = SentenceTransformer('distilbert-base-nli-stsb-mean-tokens')
-tool = language_tool_python.LanguageTool('en-US')
 from models import Evaluation  # Import the Evaluation model
 # Ensure that all required arguments are passed to the functions
 
-def save_evaluation_results(student_id, question_id, summary, similarity, grammar_mistakes, word_count, predicted_marks):
+# Bump when the metrics or the scoring formula change so stored evaluations are recomputed
+PIPELINE_VERSION = '1'
+
+def current_summarizer_version():
+    return f"{Config.SUMMARIZER_MODEL}:{Config.SUMMARIZER_BACKEND}:beams={Config.SUMMARIZER_NUM_BEAMS}"
+
+def current_model_versions():
+    summarizer = current_summarizer_version()
+    return f"{summarizer}|{Config.SENTENCE_MODEL}:{Config.SENTENCE_BACKEND}|{Config.GRAMMAR_LANGUAGE}"
+
+def evaluation_fingerprint(answer_text, model_answer):
+    """
+    Describe the inputs an evaluation was computed from. Two evaluations with
+    the same fingerprint would produce the same metrics.
+    """
+    return {
+        'answer_hash': text_hash(answer_text or ""),
+        'model_answer_hash': text_hash(model_answer or ""),
+        'pipeline_version': PIPELINE_VERSION,
+        'model_versions': current_model_versions(),
+    }
+
+def matches_fingerprint(evaluation_record, fingerprint):
+    """True if the stored evaluation was computed from the inputs in `fingerprint`."""
+    if evaluation_record is None:
+        return False
+    return all(getattr(evaluation_record, key) == value for key, value in fingerprint.items())
+
+def is_evaluation_current(evaluation_record, fingerprint):
+    """
+    True if the stored evaluation can be reused as it is. An evaluation in
+    which a stage fell back to a default value is `degraded`: it can still be
+    shown, but it is graded again next time instead of keeping the fallback
+    marks.
+    """
+    return matches_fingerprint(evaluation_record, fingerprint) and not evaluation_record.degraded
+
+def save_evaluation_results(student_id, question_id, summary, similarity, grammar_mistakes, word_count, predicted_marks, fingerprint=None):
     try:
         # Check if an evaluation record already exists
         evaluation_record = Evaluation.query.filter_by(student_id=student_id, question_id=question_id).first()
@@ -88,8 +106,12 @@ def save_evaluation_results(student_id, question_id, summary, similarity, gramma
             evaluation_record.similarity = similarity
             evaluation_record.grammar_mistakes = grammar_mistakes
             evaluation_record.word_count = word_count
-            evaluation_record.predicted_marks = predicted_marks
+            # Marks an evaluator entered by hand are kept; only the metrics are refreshed
+            if not evaluation_record.marks_overridden:
+                evaluation_record.predicted_marks = predicted_marks
             evaluation_record.summary = summary
+            for key, value in (fingerprint or {}).items():
+                setattr(evaluation_record, key, value)
             db.session.commit()
             logging.info(f"Updated evaluation for student {student_id}, question {question_id}")
         else:
@@ -101,7 +123,8 @@ def save_evaluation_results(student_id, question_id, summary, similarity, gramma
                 grammar_mistakes=grammar_mistakes,
                 word_count=word_count,
                 predicted_marks=predicted_marks,
-                summary=summary
+                summary=summary,
+                **(fingerprint or {})
             )
             db.session.add(evaluation_record)
             db.session.commit()
@@ -111,7 +134,55 @@ def save_evaluation_results(student_id, question_id, summary, similarity, gramma
         db.session.rollback()
         raise
 
+def save_evaluation_results_bulk(results):
+    """
+    Upsert many evaluation rows in a single transaction.
+
+    `results` is a list of dicts with the same keys as the arguments of
+    `save_evaluation_results`. Existing rows are looked up with one query and
+    updated in bulk, keeping any marks an evaluator overrode; the rest are
+    inserted in bulk.
+    """
+    if not results:
+        return 0
+
+    student_ids = {r['student_id'] for r in results}
+    question_ids = {r['question_id'] for r in results}
+
+    try:
+        existing = db.session.query(Evaluation.id, Evaluation.student_id, Evaluation.question_id,
+                                    Evaluation.marks_overridden).filter(
+            Evaluation.student_id.in_(student_ids),
+            Evaluation.question_id.in_(question_ids)
+        ).all()
+        existing_rows = {(row.student_id, row.question_id): row for row in existing}
+
+        updates, inserts = [], []
+        for result in results:
+            row = existing_rows.get((result['student_id'], result['question_id']))
+            if row is not None:
+                update = dict(result, id=row.id)
+                if row.marks_overridden:
+                    update.pop('predicted_marks', None)
+                updates.append(update)
+            else:
+                inserts.append(result)
+
+        if updates:
+            db.session.bulk_update_mappings(Evaluation, updates)
+        if inserts:
+            db.session.bulk_insert_mappings(Evaluation, inserts)
+        db.session.commit()
+        logging.info(f"Saved {len(results)} evaluations ({len(updates)} updated, {len(inserts)} created)")
+        return len(results)
+    except Exception as e:
+        logging.error(f"Error saving evaluation results in bulk: {e}")
+        db.session.rollback()
+        raise
+
 def load_dataset(dataset_path='student_evaluation_results (2).csv'):
+    import pandas as pd
+
     df = pd.read_csv(dataset_path, encoding='ISO-8859-1')
     logging.info("Dataset loaded successfully.")
     return df
@@ -125,69 +196,45 @@ def load_tokenizer(tokenizer_path='tokenizer.pkl'):
     tokenizer = pickle.load(open(tokenizer_path, 'rb'))
     logging.info("Tokenizer loaded successfully.")
     return tokenizer
-def evaluate_student_answers(student_id, question_id, model, tokenizer, max_seq_length, summary_result, similarity_result, grammar_mistakes, word_count_result):
-    student_answers_data = StudentAnswer.query.filter_by(student_id=student_id).all()
-    if not student_answers_data:
-        return "No answers found for the given student ID"
-
-    logging.debug(f"Number of answers fetched: {len(student_answers_data)}")
-
-    questions = []
-    student_answers = []
-
-    for i, answer_data in enumerate(student_answers_data):
-        question = str(answer_data.question_id)
-        answer = answer_data.answer_text
-
-        logging.debug(f"Question {i+1}: {question}")
-        logging.debug(f"Answer {i+1}: {answer}")
-
-        questions.append(question)
-        student_answers.append(answer)
+@timed_stage('grader')
+def predict_marks_batch(question_texts, answer_texts, max_seq_length=100, model=None, tokenizer=None, batch_size=256):
+    """
+    Predict marks for aligned lists of question and answer texts with the
+    Keras grader in a single `predict` call. Returns one mark per pair.
+    """
+    if not question_texts:
+        return []
+    if model is None or tokenizer is None:
+        model, tokenizer = get_grader()
 
-    question_seqs = tokenizer.texts_to_sequences(questions)
-    answer_seqs = tokenizer.texts_to_sequences(student_answers)
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
 
-    question_seqs = pad_sequences(question_seqs, maxlen=max_seq_length)
-    answer_seqs = pad_sequences(answer_seqs, maxlen=max_seq_length)
+    question_seqs = pad_sequences(tokenizer.texts_to_sequences(question_texts), maxlen=max_seq_length)
+    answer_seqs = pad_sequences(tokenizer.texts_to_sequences([a or "" for a in answer_texts]), maxlen=max_seq_length)
 
     logging.debug(f"Question Sequences Shape: {question_seqs.shape}")
     logging.debug(f"Answer Sequences Shape: {answer_seqs.shape}")
 
-    predicted_marks = model.predict([question_seqs, answer_seqs])
-    predicted_marks = float(predicted_marks[0][0])
-    predicted_marks = round(predicted_marks, 2)
-    
-    logging.debug(f"Predicted Marks: {predicted_marks}")
-    
-    save_evaluation_results(
-        student_id=student_id,
-        question_id=question_id,
-        summary=summary_result,
-        similarity=similarity_result,
-        grammar_mistakes=grammar_mistakes,
-        word_count=word_count_result,
-        predicted_marks=predicted_marks
-    )
-
-    return f"{predicted_marks}"
+    predicted_marks = model.predict([question_seqs, answer_seqs], batch_size=batch_size, verbose=0)
+    return [round(float(marks), 2) for marks in predicted_marks[:, 0]]
 
 def check_syntax_errors(c_code):
     try:
-        with open("temp.c", "w") as f:
-            f.write(c_code)
-        
-        result = subprocess.run(
-            ["gcc", "-fsyntax-only", "temp.c"], 
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        return result.stderr.decode('utf-8') if result.returncode != 0 else "No syntax errors detected."
+        result = get_c_runner().check_syntax(c_code)
+        if result['ok']:
+            return "No syntax errors detected."
+        return '\n'.join(Diagnostic(**d).format() for d in result['diagnostics']) or result['output']
     except Exception as e:
         logging.error(f"Error checking syntax: {e}")
         return "Error checking syntax."
 
+def check_syntax_many(sources):
+    """
+    Syntax-check many C sources concurrently. Returns one dict per source with
+    `ok`, `output` and parsed `diagnostics`.
+    """
+    return get_c_runner().check_syntax_many(sources)
+
 def calculate_total_marks(predictions, max_marks_per_question):
     try:
         total_marks = sum(predictions)  # Assuming the model outputs a single value per answer
@@ -195,43 +242,80 @@ def calculate_total_marks(predictions, max_marks_per_question):
     except Exception as e:
         logging.error(f"Error calculating total marks: {e}")
         return 0
-from transformers import pipeline
-import logging
 
-from transformers import pipeline
-import logging
-
-
-from transformers import T5Tokenizer, T5ForConditionalGeneration
-import logging
-
-def calculate_summary(text, max_length=150, min_length=50, length_penalty=2.0):
+@timed_stage('summary')
+def calculate_summary(text, max_length=150, min_length=50, length_penalty=2.0, use_cache=True):
+    """
+    Summarize one text with T5. With `use_cache=False` the summary cache is
+    neither read nor written, so the summarizer itself is measured.
+    """
+    cache = get_summary_cache() if use_cache else None
+    key = summary_key(text, current_summarizer_version(), max_length=max_length, min_length=min_length,
+                      length_penalty=length_penalty)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached
     try:
-        # Load pre-trained T5 model and tokenizer
-        model = T5ForConditionalGeneration.from_pretrained('t5-large')
-        tokenizer = T5Tokenizer.from_pretrained('t5-large')
-        
-        # Preprocess the text (T5 requires a prefix for summarization)
-        input_text = "summarize: " + text
-        inputs = tokenizer(input_text, return_tensors='pt', max_length=512, truncation=True)
-
-        # Generate summary
-        summary_ids = model.generate(inputs['input_ids'], 
-                                     max_length=max_length, 
-                                     min_length=min_length, 
-                                     length_penalty=length_penalty,
-                                     num_beams=4, 
-                                     no_repeat_ngram_size=2, 
-                                     early_stopping=True)
-
-        # Decode the summary
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        return summary
+        # The summarizer backend is loaded once per process by the registry
+        summarizer = get_summarizer()
+        summary = summarizer.generate([text], max_length=max_length, min_length=min_length,
+                                      length_penalty=length_penalty)[0]
     except Exception as e:
         logging.error(f"Error generating summary with T5: {e}")
         return "Error generating summary."
+    if cache is not None:
+        cache.put(key, summary)
+    return summary
 
 
+@timed_stage('summary_batch')
+def summarize_many(texts, batch_size=8, max_length=150, min_length=50, length_penalty=2.0, token_budget=None,
+                   failed=None):
+    """
+    Summarize a list of texts in padded `generate` batches.
+    Texts are bucketed by token length so each batch stays within
+    `token_budget` padded input tokens; `batch_size` caps texts per batch.
+    Returns summaries in the same order as `texts`. Summaries already in the
+    summary cache are not regenerated. If `failed` is a set, the indices of
+    texts whose summary could not be generated are added to it.
+    """
+    cache = get_summary_cache()
+    options = dict(max_length=max_length, min_length=min_length, length_penalty=length_penalty)
+    keys = [summary_key(text, current_summarizer_version(), **options) for text in texts]
+    cached = cache.get_many(keys)
+    # Each distinct uncached text is generated once
+    pending = {key: text for key, text in zip(keys, texts) if key not in cached}
+    if not pending:
+        return [cached[key] for key in keys]
+
+    summarizer = get_summarizer()
+    token_budget = token_budget if token_budget is not None else Config.SUMMARY_TOKEN_BUDGET
+    failed_keys = set()
+
+    def generate(batch):
+        try:
+            return summarizer.generate([text for _, text in batch], **options)
+        except Exception as e:
+            logging.error(f"Error generating summary batch with T5: {e}")
+            failed_keys.update(key for key, _ in batch)
+            return ["Error generating summary."] * len(batch)
+
+    items = list(pending.items())
+    if not token_budget:
+        summaries = [summary for start in range(0, len(items), batch_size)
+                     for summary in generate(items[start:start + batch_size])]
+    else:
+        summaries = run_bucketed(items, generate, summarizer.token_lengths(list(pending.values())), token_budget,
+                                 max_batch_size=batch_size)
+    generated = dict(zip(pending, summaries))
+    cache.put_many({key: summary for key, summary in generated.items() if key not in failed_keys})
+    cached.update(generated)
+    if failed is not None:
+        failed.update(i for i, key in enumerate(keys) if key in failed_keys)
+    return [cached[key] for key in keys]
+
+
+@timed_stage('similarity')
 def calculate_similarity(model_answer, student_answer):
     
     logging.debug(f"Model Answer: {model_answer}")
@@ -242,8 +326,11 @@ def calculate_similarity(model_answer, student_answer):
         return 0.0
     
     try:
-        enc_model = sentence_model.encode(model_answer)
+        sentence_model = get_sentence_model()
+        enc_model = get_model_answer_embedding(model_answer)
         enc_student = sentence_model.encode(student_answer)
+        from sklearn.metrics.pairwise import cosine_similarity
+
         cos_sim = cosine_similarity([enc_model], [enc_student])
         similarity_score = cos_sim[0][0] * 100  # Convert to percentage
         return round(similarity_score, 2)
@@ -251,14 +338,64 @@ def calculate_similarity(model_answer, student_answer):
         logging.error(f"Error calculating similarity: {e}")
         return 0.0
 
+@timed_stage('similarity_batch')
+def calculate_similarity_many(model_answers, student_answers, batch_size=32, failed=None):
+    """
+    Batched version of `calculate_similarity` for aligned lists of answers.
+    Model answer embeddings come from the embedding store. If `failed` is a
+    set, the indices of answers that could not be scored are added to it.
+    """
+    scores = [0.0] * len(student_answers)
+    valid = [i for i, (m, a) in enumerate(zip(model_answers, student_answers)) if m is not None and a is not None]
+    if not valid:
+        return scores
+
+    try:
+        sentence_model = get_sentence_model()
+        unique_model_answers = list(dict.fromkeys(model_answers[i] for i in valid))
+        model_index = {text: row for row, text in enumerate(unique_model_answers)}
+
+        enc_models = np.stack(get_model_answer_embeddings(unique_model_answers))
+        enc_models = enc_models / np.linalg.norm(enc_models, axis=1, keepdims=True)
+        enc_students = sentence_model.encode_many([student_answers[i] for i in valid], batch_size=batch_size, normalize_embeddings=True)
+
+        # Embeddings are unit length, so the row-wise dot product is the cosine similarity
+        rows = np.asarray([model_index[model_answers[i]] for i in valid])
+        cos_sims = np.einsum('ij,ij->i', enc_models[rows], enc_students) * 100
+        for i, score in zip(valid, cos_sims):
+            scores[i] = round(float(score), 2)
+    except Exception as e:
+        logging.error(f"Error calculating similarity batch: {e}")
+        if failed is not None:
+            failed.update(valid)
+
+    return scores
+
+@timed_stage('grammar')
 def count_grammar_mistakes(text):
     try:
-        matches = tool.check(text)
-        return len(matches)
+        mistakes = get_grammar_service().check(text)
+        return mistakes if mistakes is not None else 0
     except Exception as e:
         logging.error(f"Error counting grammar mistakes: {e}")
         return 0
 
+@timed_stage('grammar_batch')
+def count_grammar_mistakes_many(texts, failed=None):
+    """
+    Batched version of `count_grammar_mistakes`; checks are spread across the
+    LanguageTool server pool. If `failed` is a set, the indices of texts that
+    could not be checked are added to it.
+    """
+    failed = failed if failed is not None else set()
+    try:
+        mistakes = get_grammar_service().check_many(texts)
+    except Exception as e:
+        logging.error(f"Error counting grammar mistakes: {e}")
+        mistakes = [None] * len(texts)
+    failed.update(i for i, count in enumerate(mistakes) if count is None)
+    return [count if count is not None else 0 for count in mistakes]
+
 def word_count(text):
     try:
         return len(text.split())
@@ -266,9 +403,73 @@ def word_count(text):
         logging.error(f"Error calculating word count: {e}")
         return 0
 
+def grade_answer(student_id, question_id, force=False):
+    """
+    Compute every metric for one student's answer and save the evaluation.
+    Each model stage runs inside its model slot so concurrent graders do not
+    pile onto the same model.
+
+    Nothing is recomputed when the stored evaluation was produced from the
+    same inputs, unless `force` is set. If a stage fails, the evaluation is
+    saved with its fallback value and marked degraded, so it is recomputed
+    on the next request.
+    """
+    answer_record = StudentAnswer.query.filter_by(student_id=student_id, question_id=question_id)\
+        .order_by(StudentAnswer.id.desc()).first()
+    question_record = Questions.query.filter_by(id=question_id).first()
+    if not answer_record or not question_record:
+        raise ValueError(f"Answer or question not found for student {student_id}, question {question_id}")
+
+    student_answer = answer_record.answer_text or ""
+    model_answer = question_record.model_answer
+
+    fingerprint = evaluation_fingerprint(student_answer, model_answer)
+    evaluation_record = Evaluation.query.filter_by(student_id=student_id, question_id=question_id).first()
+    if not force and is_evaluation_current(evaluation_record, fingerprint):
+        logging.info(f"Evaluation for student {student_id}, question {question_id} is up to date")
+        return evaluation_record.predicted_marks
+
+    # The batch functions report failed stages instead of only returning a fallback value
+    failed = set()
+    with model_slot('summarizer'):
+        summary_result = summarize_many([student_answer], failed=failed)[0]
+    with model_slot('sentence_model'):
+        similarity_result = calculate_similarity_many([model_answer], [student_answer], failed=failed)[0]
+    with model_slot('grammar_tool'):
+        grammar_mistakes = count_grammar_mistakes_many([student_answer], failed=failed)[0]
+    word_count_result = word_count(student_answer)
+    if failed:
+        logging.warning(f"Evaluation for student {student_id}, question {question_id} used fallback values; "
+                        f"it will be recomputed")
+
+    predicted_marks = score_answer(similarity_result, word_count_result, grammar_mistakes)
+    save_evaluation_results(
+        student_id=student_id,
+        question_id=question_id,
+        summary=summary_result,
+        similarity=similarity_result,
+        grammar_mistakes=grammar_mistakes,
+        word_count=word_count_result,
+        predicted_marks=predicted_marks,
+        fingerprint=dict(fingerprint, degraded=bool(failed))
+    )
+    return predicted_marks
+
+def score_answer(similarity_result, word_count_result, grammar_mistakes):
+    """
+    Turn the answer metrics into predicted marks out of 10.
+    """
+    predicted_marks = max(0, min(10, (similarity_result * 0.5 + word_count_result * 0.3 + (100 - grammar_mistakes) * 0.2)))
+
+    if similarity_result <= 35:
+        predicted_marks = 0
+    if word_count_result <= 6:
+        predicted_marks = 0
+
+    return predicted_marks
+
 
 
-import subprocess
 import os
 
 def evaluate_errors(error_log):
@@ -281,93 +482,185 @@ def evaluate_errors(error_log):
     Returns:
     - dict: A dictionary with error details.
     """
-    errors = {
-        "total_errors": 0,
-        "critical_errors": 0,
-        "warnings": 0,
-        "error_messages": []
-    }
+    return classify_errors(error_log)
 
-    # Example criteria: Counting critical errors and warnings
-    for line in error_log.splitlines():
-        if "error:" in line.lower():
-            errors["total_errors"] += 1
-            errors["critical_errors"] += 1
-            errors["error_messages"].append(line)
-        elif "warning:" in line.lower():
-            errors["total_errors"] += 1
-            errors["warnings"] += 1
-            errors["error_messages"].append(line)
-    
-    return errors
-import os
-import subprocess
+def run_outcome(result):
+    """Turn a `CRunner.run` result into ("Success", output) or (error status, error details)."""
+    if result['status'] == 'Compilation Error':
+        return "Compilation Error", classify_errors(result['compile_output'])
+    if result['status'] == 'Runtime Error':
+        return "Runtime Error", classify_errors(runtime_error_log(result), is_runtime=True)
+    return "Success", result['stdout'].strip()
 
-def run_c_program(file_path):
+def run_c_source(source, stdin_data=None):
+    """
+    Compile and run a C program in its own sandboxed job directory.
+    Returns ("Success", output) or ("Compilation Error"/"Runtime Error", error details).
+    """
     try:
-        # Save output to a directory with confirmed write permissions
-        output_file_path = os.path.join(os.environ['USERPROFILE'], 'Desktop', 'a.exe')
-        
-        gcc_path = 'C:/Users/DELL/Downloads/gcc-14.1.0-no-debug/bin/gcc-14.1.0.exe'
-
-        # Compile the C program
-        compile_process = subprocess.Popen(
-            [gcc_path, '-o', output_file_path, file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        stdout, stderr = compile_process.communicate()
-
-        # Check for compilation errors
-        if compile_process.returncode != 0:
-            error_log = stderr.decode('utf-8')
-            return "Compilation Error", classify_errors(error_log)
-
-        # Execute the compiled program
-        run_process = subprocess.Popen(
-            [output_file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-        run_stdout, run_stderr = run_process.communicate()
-
-        # Check for runtime errors
-        if run_process.returncode != 0:
-            runtime_error_log = run_stderr.decode('utf-8')
-            return "Runtime Error", classify_errors(runtime_error_log, is_runtime=True)
-
-        # If no errors, return success message and program output
-        output = run_stdout.decode('utf-8').strip()
-        return "Success", output
+        result = get_c_runner().run(source, stdin_data)
+    except Exception as e:
+        logging.error(f"Error running C program: {e}")
+        return "Runtime Error", classify_errors(f"error: {e}", is_runtime=True)
+    return run_outcome(result)
+
+def run_c_tests(source, test_cases):
+    """
+    Run a C program against a question's CTestCase rows. Returns the
+    `CRunner.run_tests` result with each case's `test_case` attached.
+    """
+    cases = [((case.input_text or '').encode('utf-8'), case.expected_output) for case in test_cases]
+    result = get_c_runner().run_tests(source, cases)
+    for case, case_result in zip(test_cases, result['cases']):
+        case_result['test_case'] = case
+    return result
+
+def question_budget(question):
+    """Resource budget measured from a question's reference solution, or None."""
+    if question is None or question.reference_cpu_seconds is None:
+        return None
+    return {'cpu_seconds': question.reference_cpu_seconds, 'max_rss_kb': question.reference_max_rss_kb}
+
+def measure_reference_solution(source, test_cases=()):
+    """
+    Run a reference solution (against `test_cases` when given) and return its
+    resource profile. Raises ValueError if it does not compile, run or pass.
+    """
+    if test_cases:
+        result = run_c_tests(source, test_cases)
+        failed = [i + 1 for i, case in enumerate(result['cases']) if not case['passed']]
+        if result['status'] == 'Compilation Error' or failed:
+            raise ValueError(f"The reference solution did not pass test cases {failed or 'all'}")
+        return result['profile']
+    result = get_c_runner().run(source)
+    if result['status'] != 'Success':
+        raise ValueError(f"The reference solution failed: {result['status']}")
+    return result['profile']
+
+def performance_adjustment(profile, budget):
+    """
+    Compare a run's resource profile with the question's budget. Returns
+    (mark adjustment, {'cpu': ratio, 'memory': ratio}). A run more than
+    C_PERFORMANCE_SLOW_RATIO times over budget loses C_PERFORMANCE_PENALTY
+    marks; one within budget gains C_PERFORMANCE_BONUS. Tiny measurements
+    are raised to a floor so timer and allocator noise does not decide marks.
+    """
+    if not profile or not budget:
+        return 0, {}
+    ratios = {}
+    if budget.get('cpu_seconds') is not None and profile.get('cpu_seconds') is not None:
+        floor = Config.C_PERFORMANCE_MIN_CPU_SECONDS
+        ratios['cpu'] = round(max(profile['cpu_seconds'], floor) / max(budget['cpu_seconds'], floor), 2)
+    if budget.get('max_rss_kb') is not None and profile.get('max_rss_kb') is not None:
+        floor = Config.C_PERFORMANCE_MIN_RSS_KB
+        ratios['memory'] = round(max(profile['max_rss_kb'], floor) / max(budget['max_rss_kb'], floor), 2)
+    if not ratios:
+        return 0, ratios
+
+    worst = max(ratios.values())
+    if worst > Config.C_PERFORMANCE_SLOW_RATIO:
+        return -Config.C_PERFORMANCE_PENALTY, ratios
+    if worst <= 1.0:
+        return Config.C_PERFORMANCE_BONUS, ratios
+    return 0, ratios
+
+def _apply_performance(marks, max_marks, profile, budget):
+    if not Config.C_PERFORMANCE_MARKS or profile is None or budget is None:
+        return marks
+    adjustment, _ = performance_adjustment(profile, budget)
+    return round(min(max_marks, max(0, marks + adjustment)), 2)
+
+def calculate_test_marks(case_results, max_marks=10, profile=None, budget=None):
+    """
+    Marks proportional to the weight of the passed test cases. Only a program
+    that passes every case is adjusted for performance against `budget` (see
+    `calculate_marks`); a fast but wrong program is not efficient.
+    """
+    total_weight = sum(result['test_case'].weight for result in case_results)
+    if not total_weight:
+        return 0
+    passed_weight = sum(result['test_case'].weight for result in case_results if result['passed'])
+    marks = round(max_marks * passed_weight / total_weight, 2)
+    if not all(result['passed'] for result in case_results):
+        return marks
+    return _apply_performance(marks, max_marks, profile, budget)
+
+def grade_c_submission(source, stdin_data=None, question=None):
+    """
+    Compile, run and mark one C submission. Questions with test cases are
+    marked on the cases they pass; otherwise the program runs once on
+    `stdin_data`. Returns a JSON-serializable dict with the `status`,
+    `message`, `marks`, `test_results`, resource `profile` and, when the
+    question has a reference budget, the `performance` comparison that
+    result.html renders.
+    """
+    budget = question_budget(question)
+
+    def graded(status, message, marks, test_results=(), profile=None):
+        performance = None
+        if profile and budget and status == 'Success':
+            adjustment, ratios = performance_adjustment(profile, budget)
+            performance = {'budget': budget, 'ratios': ratios,
+                           'adjustment': adjustment if Config.C_PERFORMANCE_MARKS else 0}
+        return {'status': status, 'message': message, 'marks': marks, 'test_results': list(test_results),
+                'profile': profile, 'performance': performance}
+
+    if question is not None and question.test_cases:
+        result = run_c_tests(source, question.test_cases)
+        if result['status'] == 'Compilation Error':
+            details = classify_errors(result['compile_output'])
+            return graded(result['status'], details, calculate_marks(details))
+
+        passed = sum(case['passed'] for case in result['cases'])
+        status = result['status']
+        if status == 'Success' and passed < len(result['cases']):
+            status = 'Wrong Output'
+        test_results = [{
+            'passed': case['passed'], 'timed_out': case['timed_out'], 'returncode': case['returncode'],
+            'seconds': case['seconds'], 'stdout': case['stdout'], 'profile': case['profile'],
+            'test_case': {'id': case['test_case'].id, 'input_text': case['test_case'].input_text,
+                          'expected_output': case['test_case'].expected_output,
+                          'is_hidden': bool(case['test_case'].is_hidden)},
+        } for case in result['cases']]
+        # Performance only counts for programs that pass every case
+        return graded(status, f"{passed} of {len(result['cases'])} test cases passed",
+                      calculate_test_marks(result['cases'], profile=result['profile'], budget=budget), test_results,
+                      result['profile'])
 
+    try:
+        result = get_c_runner().run(source, stdin_data)
     except Exception as e:
-        return "Runtime Error", str(e)
+        logging.error(f"Error running C program: {e}")
+        details = classify_errors(f"error: {e}", is_runtime=True)
+        return graded("Runtime Error", details, calculate_marks(details))
+
+    status, message = run_outcome(result)
+    if status == 'Success':
+        marks = calculate_marks(classify_errors(''), profile=result['profile'], budget=budget)
+    else:
+        marks = calculate_marks(message)
+    return graded(status, message, marks, profile=result.get('profile'))
+
+def run_c_program(file_path, input_path=None):
+    with open(file_path, encoding='utf-8') as f:
+        source = f.read()
+    stdin_data = None
+    if input_path:
+        with open(input_path, 'rb') as f:
+            stdin_data = f.read()
+    return run_c_source(source, stdin_data)
     
 def classify_errors(error_log, is_runtime=False):
-    error_details = {
-        'total_errors': 0,
-        'critical_errors': 0,
-        'syntax_errors': 0,
-        'warnings': 0,
-        'error_messages': []
-    }
+    """Parse gcc diagnostics (JSON or text) or a runtime error log into error details."""
+    return summarize_diagnostics(parse_diagnostics(error_log), is_runtime=is_runtime)
 
-    lines = error_log.split('\n')
-    for line in lines:
-        if 'error' in line.lower():
-            error_details['total_errors'] += 1
-            if 'critical' in line.lower():
-                error_details['critical_errors'] += 1
-            elif 'syntax' in line.lower():
-                error_details['syntax_errors'] += 1
-            else:
-                error_details['warnings'] += 1
-            error_details['error_messages'].append(line)
-    
-    if is_runtime:
-        error_details['warnings'] += len(error_details['error_messages'])
-
-    return error_details
-
-def calculate_marks(error_details):
+def calculate_marks(error_details, profile=None, budget=None):
+    """
+    Marks out of 10 for a compiled program's error details. When
+    Config.C_PERFORMANCE_MARKS is set and the run's resource `profile` and
+    the question's reference `budget` are given, marks are adjusted for
+    performance (see `performance_adjustment`).
+    """
     max_marks = 10
     total_errors = error_details['total_errors']
     critical_errors = error_details['critical_errors']
@@ -380,6 +673,4 @@ def calculate_marks(error_details):
     # Warning penalties
     marks = max_marks - (warnings * (max_marks * 0.2))
     marks = max(0, marks)  # Ensure non-negative marks
-    return round(marks, 2)
-
-
+    return _apply_performance(round(marks, 2), max_marks, profile, budget)